@@ -1,27 +1,397 @@
-import pandas as pd
 import argparse
+import json
+import math
+import os
+import sys
+import openpyxl
+import zipfile
+from openpyxl.cell.cell import ERROR_CODES
+from datetime import date, datetime, time, timedelta
+from fnmatch import fnmatchcase
+from itertools import chain, islice
+from sheetgrid import SheetGrid, UNNAMED_LABEL_RE
+from xlsxzip import XlsxReader, sheet_parts
 
+READER_ENGINES = ("pandas", "openpyxl", "xml")
 
-def excel_to_json(excel_file, output_file=None, sheet_name='Sheet'):
+# Strings pd.read_excel treats as missing by default (pandas' STR_NA_VALUES)
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+UNIX_EPOCH = datetime(1970, 1, 1)
+pd = None # pandas, imported on first use: the openpyxl and xml readers run without it
+
+
+def _import_pandas():
+    global pd
+    if pd is None:
+        import pandas
+        pd = pandas
+    return pd
+
+
+def _is_pandas_workbook(xls):
+    # Nothing is a pd.ExcelFile while pandas hasn't been imported
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(xls, pandas.ExcelFile)
+
+
+def find_sheet_name(all_sheet_names, sheet_name):
+    # First sheet whose name starts with sheet_name, else an exact match, else None
+    for s_name in all_sheet_names:
+        if s_name.startswith(str(sheet_name)):
+            return s_name
+    if sheet_name in all_sheet_names:
+        return sheet_name
+    return None
+
+
+def select_sheet_names(all_sheet_names, sheet_filter=None):
+    # Sheets matching a glob ("50*", "50?0") or, without wildcards, a name prefix like find_sheet_name.
+    # No filter selects every sheet.
+    if not sheet_filter:
+        return list(all_sheet_names)
+    sheet_filter = str(sheet_filter)
+    if any(ch in sheet_filter for ch in "*?["):
+        return [s_name for s_name in all_sheet_names if fnmatchcase(s_name, sheet_filter)]
+    return [s_name for s_name in all_sheet_names if s_name.startswith(sheet_filter)]
+
+
+def sheet_to_json(xls, sheet_name):
+    # Read one sheet from an already opened pd.ExcelFile and return the pandas JSON string
+    excel_data_fragment = _import_pandas().read_excel(xls, sheet_name=sheet_name)
+    return excel_data_fragment.to_json()
+
+
+def _json_float(value):
+    # Same rounding DataFrame.to_json applies (double_precision=10), NaN/inf become null
+    if not math.isfinite(value):
+        return None
+    magnitude = abs(value)
+    if magnitude >= 1e16 or (magnitude and magnitude < 1e-15):
+        return float(f"{value:.9e}")
+    return float(f"{value:.10f}") + 0.0
+
+
+def _json_value(value):
+    # Mirror what json.loads(df.to_json()) would give back for a single cell
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        return _json_float(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return pd.Timestamp(value).value // 10**6 # epoch milliseconds, like to_json's default date_unit
+    if isinstance(value, pd.Timedelta):
+        return value.value // 10**6
+    if isinstance(value, time):
+        return value.isoformat()
+    if hasattr(value, 'item'): # numpy scalars
+        return _json_value(value.item())
+    return value
+
+
+def _frame_columns(df):
+    # (column labels, per-column lists of JSON-ready values) for a DataFrame
+    _import_pandas() # for _json_value
+    labels = []
+    column_values = []
+    for col_label, series in df.items():
+        labels.append(str(col_label))
+        if series.dtype.kind == 'f':
+            column_values.append([_json_float(v) for v in series.tolist()])
+        else:
+            column_values.append([_json_value(v) for v in series.tolist()])
+    return labels, column_values
+
+
+def frame_to_raw_data(df):
+    # Column -> row -> value dict equivalent to json.loads(df.to_json()), without the string round-trip
+    labels, column_values = _frame_columns(df)
+    row_keys = [str(row_idx) for row_idx in df.index]
+    return {label: dict(zip(row_keys, values)) for label, values in zip(labels, column_values)}
+
+
+def frame_to_grid(df):
+    # Same values as frame_to_raw_data, as a SheetGrid; "Unnamed: N" labels become header-less columns
+    labels, column_values = _frame_columns(df)
+    headers = [None if UNNAMED_LABEL_RE.match(label) else label for label in labels]
+    return SheetGrid.from_columns(headers, column_values)
+
+
+def _openpyxl_cell(value):
+    # Same per-cell conversion pandas' openpyxl reader does, minus the DataFrame
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        as_int = int(value) if math.isfinite(value) else None
+        return as_int if as_int == value else float(value)
+    if isinstance(value, str):
+        # read-only values_only mode hands back error cells as their code; pandas reads them as NaN
+        return None if value in NA_STRINGS or value in ERROR_CODES else value
+    return value
+
+
+def _epoch_ms(value):
+    if isinstance(value, datetime):
+        return (value - UNIX_EPOCH) // timedelta(milliseconds=1)
+    if isinstance(value, date):
+        return (value - UNIX_EPOCH.date()).days * 86400000
+    if isinstance(value, timedelta):
+        return value // timedelta(milliseconds=1)
+    return value.isoformat() # datetime.time
+
+
+def _column_json_values(values):
+    # pandas stores a column holding only numbers as float64 as soon as it has a gap or a float,
+    # which to_json then writes as floats; any other column keeps its Python objects.
+    present = [v for v in values if v is not None]
+    numeric = all(type(v) is int or type(v) is float for v in present)
+    if numeric and (len(present) < len(values) or any(type(v) is float for v in present)):
+        return [None if v is None else _json_float(float(v)) for v in values]
+    return [
+        _json_float(v) if type(v) is float else
+        _epoch_ms(v) if isinstance(v, (date, time, timedelta)) else v
+        for v in values
+    ]
+
+
+def _dedup_column_names(names):
+    # pandas' mangling of repeated header labels: "X", "X.1", "X.2", ...
+    counts = {}
+    deduped = []
+    for name in names:
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        deduped.append(name)
+    return deduped
+
+
+def _rows_to_columns(rows):
+    # Turn raw worksheet rows (header row first) into (header labels, per-column value lists) the
+    # way pandas would: None labels for empty header cells, JSON-ready values
+    data = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(rows):
+        converted_row = [_openpyxl_cell(v) for v in row]
+        while converted_row and converted_row[-1] is None:
+            converted_row.pop()
+        if converted_row:
+            last_row_with_data = row_number
+        data.append(converted_row)
+    del data[last_row_with_data + 1:]
+    if not data:
+        return [], []
+
+    width = max(len(data_row) for data_row in data)
+    header = data[0] + [None] * (width - len(data[0]))
+    deduped = iter(_dedup_column_names([label for label in header if label is not None]))
+    headers = [None if label is None else str(next(deduped)) for label in header]
+
+    column_values = []
+    for col_idx in range(width):
+        values = [data_row[col_idx] if col_idx < len(data_row) else None for data_row in data[1:]]
+        column_values.append(_column_json_values(values))
+    return headers, column_values
+
+
+def rows_to_grid(rows):
+    headers, column_values = _rows_to_columns(rows)
+    return SheetGrid.from_columns(headers, column_values)
+
+
+def planned_rows_to_grid(rows, plan):
+    # rows_to_grid following a sheetgrid.ReadPlan: the header row and plan.probe_rows data rows in
+    # full, then only the planned columns. Unplanned columns keep their probe values; when no columns
+    # are planned the rest of the sheet isn't even parsed.
+    rows = iter(rows)
+    head = list(islice(rows, plan.probe_rows + 1))
+    probe = rows_to_grid(head)
+    columns = plan.plan_columns(probe)
+    if columns is None:
+        return rows_to_grid(chain(head, rows))
+    # Planned columns from the first data row down, each converted in one go; rows past the last one
+    # with data in any column are dropped, like rows_to_grid does
+    data_rows = head[1:] + list(rows) if columns else []
+    planned = {}
+    n_rows = probe.n_rows
+    n_cols = probe.n_cols
+    for col in sorted(columns):
+        values = [_openpyxl_cell(row[col]) if col < len(row) else None for row in data_rows]
+        length = len(values)
+        while length and values[length - 1] is None:
+            length -= 1
+        if length:
+            n_rows = max(n_rows, length)
+            n_cols = max(n_cols, col + 1)
+        planned[col] = values
+
+    headers = probe.columns + [None] * (n_cols - probe.n_cols)
+    column_values = []
+    for col in range(n_cols):
+        if col in planned:
+            values = planned[col][:n_rows]
+            column_values.append(_column_json_values(values + [None] * (n_rows - len(values))))
+        else:
+            values = probe.column(col) if col < probe.n_cols else []
+            column_values.append(values + [None] * (n_rows - len(values)))
+    return SheetGrid.from_columns(headers, column_values)
+
+
+class CachedWorkbook:
+    """
+    A workbook whose parsed sheets go through a SheetCache (see sheetcache.py). The .xlsx is only
+    opened on the first cache miss and sheet names come from the zip, so a workbook whose sheets
+    are all cached is never parsed at all.
+    """
+
+    def __init__(self, excel_file, cache, engine='pandas'):
+        self.excel_file = excel_file
+        self.cache = cache
+        self.engine = engine
+        self._xls = None
+        self._sheet_names = None
+
+    @property
+    def xls(self):
+        if self._xls is None:
+            self._xls = open_workbook(self.excel_file, self.engine)
+        return self._xls
+
+    @property
+    def sheet_names(self):
+        if self._sheet_names is None:
+            self._sheet_names = read_sheet_names(self.excel_file, self.engine)
+        return self._sheet_names
+
+    def read_sheet_grid(self, sheet_name, plan=None):
+        # A planned read is a different (partial) grid, cached apart from the full one
+        key = self.engine if plan is None or self.engine == 'pandas' else f"{self.engine}:{plan.name}"
+        grid = self.cache.get(self.excel_file, sheet_name, key)
+        if grid is None:
+            grid = read_sheet_grid(self.xls, sheet_name, plan)
+            self.cache.put(self.excel_file, sheet_name, grid, key)
+        return grid
+
+    def close(self):
+        if self._xls is not None:
+            self._xls.close()
+            self._xls = None
+
+
+def open_workbook(excel_file, engine='pandas', cache=None):
+    # pandas.ExcelFile, a streaming read-only openpyxl workbook for engine='openpyxl' or an
+    # xlsxzip.XlsxReader for engine='xml'; with a SheetCache, a CachedWorkbook that only opens
+    # one of them when it has to
+    if cache is not None:
+        if not os.path.exists(excel_file):
+            raise FileNotFoundError(excel_file)
+        return CachedWorkbook(excel_file, cache, engine)
+    if engine == 'xml':
+        return XlsxReader(excel_file)
+    if engine == 'openpyxl':
+        return openpyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=False)
+    return _import_pandas().ExcelFile(excel_file)
+
+
+def read_sheet_names(excel_file, engine='pandas'):
+    # Sheet names straight from the .xlsx zip, without parsing the workbook; other formats
+    # (e.g. .xls) are opened with the reader
     try:
-        xls = pd.ExcelFile(excel_file)
-        all_sheet_names = xls.sheet_names
-        
-        target_sheet_name = None
-        for s_name in all_sheet_names:
-            if s_name.startswith(str(sheet_name)):
-                target_sheet_name = s_name
-                break
+        with zipfile.ZipFile(excel_file) as zf:
+            return list(sheet_parts(zf))
+    except (zipfile.BadZipFile, KeyError):
+        xls = open_workbook(excel_file, engine)
+        try:
+            return list(workbook_sheet_names(xls))
+        finally:
+            xls.close()
+
+
+def workbook_sheet_names(xls):
+    if isinstance(xls, CachedWorkbook):
+        return xls.sheet_names
+    return xls.sheet_names if _is_pandas_workbook(xls) else xls.sheetnames
+
+
+def read_sheet_data(xls, sheet_name):
+    # Read one sheet from an already opened workbook (see open_workbook) straight into the column -> row -> value dict
+    if _is_pandas_workbook(xls):
+        return frame_to_raw_data(_import_pandas().read_excel(xls, sheet_name=sheet_name))
+    return read_sheet_grid(xls, sheet_name).to_raw_data()
+
+
+def iter_sheet_rows(xls, sheet_name, max_row=None):
+    # Raw value rows (header row first) of a sheet of a streaming openpyxl or xml workbook
+    if isinstance(xls, XlsxReader):
+        return xls.iter_rows(sheet_name, max_row)
+    worksheet = xls[sheet_name]
+    worksheet.reset_dimensions()
+    return worksheet.iter_rows(max_row=max_row, values_only=True)
+
+
+def read_sheet_grid(xls, sheet_name, plan=None):
+    # Read one sheet from an already opened workbook into a SheetGrid. With a sheetgrid.ReadPlan the
+    # openpyxl and xml readers only load the cells the plan asks for (see planned_rows_to_grid); pandas
+    # parses every cell whatever usecols/nrows say, so it always reads the whole sheet.
+    if isinstance(xls, CachedWorkbook):
+        return xls.read_sheet_grid(sheet_name, plan)
+    if _is_pandas_workbook(xls):
+        return frame_to_grid(_import_pandas().read_excel(xls, sheet_name=sheet_name))
+    if plan is not None:
+        return planned_rows_to_grid(iter_sheet_rows(xls, sheet_name), plan)
+    return rows_to_grid(iter_sheet_rows(xls, sheet_name))
+
+
+def excel_to_json(excel_file, output_file=None, sheet_name='Sheet', return_data=False, engine='pandas', as_grid=False, cache=None,
+                  exact_match=False, read_plan=None):
+    # With return_data=True the column -> row -> value dict (a SheetGrid with as_grid=True) is returned
+    # instead of printed; output_file then only serves as an optional debug dump of the dict.
+    # engine='openpyxl' streams the sheet through openpyxl's read-only mode instead of pd.read_excel,
+    # engine='xml' through xlsxzip's value-only parser.
+    # cache: a sheetcache.SheetCache to take the parsed sheet from, or to keep it in for next time.
+    # exact_match=True only accepts a sheet named exactly sheet_name (no prefix matching).
+    # read_plan: a sheetgrid.ReadPlan limiting the returned grid to the cells it needs (as_grid only).
+    try:
+        # Accept an already opened workbook so batch callers don't re-parse the .xlsx per sheet
+        if _is_pandas_workbook(excel_file) or isinstance(excel_file, (openpyxl.Workbook, XlsxReader, CachedWorkbook)):
+            xls = excel_file
+        else:
+            xls = open_workbook(excel_file, engine, cache)
+        all_sheet_names = workbook_sheet_names(xls)
         
+        if exact_match:
+            target_sheet_name = sheet_name if sheet_name in all_sheet_names else None
+        else:
+            target_sheet_name = find_sheet_name(all_sheet_names, sheet_name)
         if target_sheet_name is None:
-            if sheet_name in all_sheet_names:
-                target_sheet_name = sheet_name
-            else:
-                print(f"Error: Worksheet starting with or named '{sheet_name}' not found in '{excel_file}'. Available sheets: {all_sheet_names}")
-                return
+            print(f"Error: Worksheet starting with or named '{sheet_name}' not found in '{excel_file}'. Available sheets: {all_sheet_names}")
+            return
 
-        excel_data_fragment = pd.read_excel(xls, sheet_name=target_sheet_name)
-        json_str = excel_data_fragment.to_json()
+        if return_data:
+            sheet_data = read_sheet_grid(xls, target_sheet_name, read_plan) if as_grid else read_sheet_data(xls, target_sheet_name)
+            if output_file:
+                raw_data = sheet_data.to_raw_data() if as_grid else sheet_data
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(raw_data, f, separators=(',', ':'))
+            return sheet_data
+
+        if _is_pandas_workbook(xls):
+            json_str = sheet_to_json(xls, target_sheet_name)
+        else:
+            json_str = json.dumps(read_sheet_data(xls, target_sheet_name), separators=(',', ':'))
 
         if output_file:
             with open(output_file, 'w', encoding='utf-8') as f:
@@ -40,9 +410,10 @@ def main():
     parser.add_argument("excel_file", help="Path to the Excel file.")
     parser.add_argument("-o", "--output_file", help="Path to save the JSON output.")
     parser.add_argument("-s", "--sheet_name", help="Name of the sheet to convert.")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="pandas", help="Sheet reader: pd.read_excel (default), streaming read-only openpyxl, or xml (a value-only parser streaming the sheet XML straight out of the .xlsx).")
     args = parser.parse_args()
     
-    excel_to_json(args.excel_file, args.output_file, args.sheet_name)
+    excel_to_json(args.excel_file, args.output_file, args.sheet_name, engine=args.reader)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,328 @@
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import openpyxl
+
+from aexcel import READER_ENGINES, _import_pandas, _is_pandas_workbook, frame_to_grid, iter_sheet_rows, open_workbook, planned_rows_to_grid, rows_to_grid, workbook_sheet_names
+from bnulls import clean_sheet_grid
+from cformat import KOPERASI_KEY, STATEMENT_READ_PLAN, format_dynamically
+from dwrite import ENCODERS, OUTPUT_FORMATS, StatementWriter
+from instrument import MB, STATS, peak_rss
+
+# open: opening the workbook, read: pd.read_excel / openpyxl rows, to_grid: cell values to the
+# SheetGrid (what the to_json round-trip used to do), clean: clean_sheet_grid (clean_json_data's
+# grid form), format: format_dynamically, write: streaming the statement to the output file
+STAGES = ("open", "read", "to_grid", "clean", "format", "write")
+# A stage (or the throughput / peak RSS) this much worse than the baseline counts as a regression
+DEFAULT_TOLERANCE = 0.10
+# Synthetic workbook sizes of the stage benchmark and of --memory-check
+DEFAULT_SHEETS = 100
+MEMORY_CHECK_SHEETS = 5000
+
+GELARAN = ("ENCIK", "PUAN", "CIK", "TUAN")
+NAMES = ("AHMAD", "SITI", "MOHD", "NURUL", "ADNAN", "FARIDAH", "ISMAIL", "AMINAH", "RAZAK", "ZAINAB")
+RELATIONSHIPS = ("IBU", "BAPA", "ISTERI", "SUAMI", "ANAK")
+
+
+def _ic_number(rng, birth):
+    return f"{birth:%y%m%d}-{rng.randint(1, 16):02d}-{rng.randint(1000, 9999)}"
+
+
+def synthetic_sheet_rows(rng, member_no, n_transactions):
+    """
+    Rows of one statement sheet in the layout cformat expects: the Koperasi title in C1, member
+    labels in C7:C19 with values in E, transaction headers on rows 21/22 and the transactions below.
+    """
+    width = 15 # A..O
+    rows = [[None] * width for _ in range(22 + n_transactions)]
+
+    def put(excel_row, col, value):
+        rows[excel_row - 1][col] = value
+
+    birth = datetime(1950, 1, 1) + timedelta(days=rng.randint(0, 18000))
+    joined = datetime(2005, 1, 1) + timedelta(days=rng.randint(0, 6000))
+    name = f"{rng.choice(NAMES)} BIN {rng.choice(NAMES)}"
+    address = f"NO.{rng.randint(1, 200)},JALAN {rng.choice(NAMES)},70300 SEREMBAN."
+
+    put(1, 2, KOPERASI_KEY)
+    for excel_row, text in enumerate(("NO.154 (ATAS),JALAN DATO' BANDAR TUNGGAL,", "70000 SEREMBAN.",
+                                      "EMAIL:kppmns.coop@gmail.com", "TEL:06-7635868 FAX:06-7655868"), start=2):
+        put(excel_row, 6, text)
+    member_rows = [
+        ("NO. ANGGOTA", member_no), ("GELARAN", rng.choice(GELARAN)), ("NAMA", name),
+        ("NO. K/P", _ic_number(rng, birth)), ("TARIKH LAHIR", birth), ("ALAMAT TETAP", address),
+        ("ALAMAT SURAT MENYURAT", address), ("NO. TELEFON ANGGOTA", f"01{rng.randint(0, 9)}-{rng.randint(1000000, 9999999)}"),
+        ("PERKERJAAN", "PENIAGA"),
+        ("PENAMA / K.P", f"{rng.choice(NAMES)} BINTI {rng.choice(NAMES)}({rng.choice(RELATIONSHIPS)}/{_ic_number(rng, birth)})"),
+        ("NO. TELEFON PENAMA ", f"01{rng.randint(0, 9)}-{rng.randint(1000000, 9999999)}"),
+        ("TARIKH MASUK", joined), ("TARIKH LULUS ALK", joined + timedelta(days=rng.randint(5, 60))),
+    ]
+    for excel_row, (label, value) in enumerate(member_rows, start=7):
+        put(excel_row, 2, label)
+        put(excel_row, 4, value)
+
+    for col, text in ((2, "TARIKH"), (3, "PERKARA"), (6, "WANG"), (7, "WANG"), (8, "BAKI"), (9, "BAKI"), (10, "BAKI"), (14, "CATATAN")):
+        put(21, col, text)
+    for col, text in ((4, "NO.RESIT"), (5, "TAHUN"), (6, "MASUK"), (7, "KELUAR"), (8, "SYER"), (9, "BONUS"), (10, "SEMUA")):
+        put(22, col, text)
+
+    share = 0.0
+    bonus = 1000.0
+    day = joined
+    for i in range(n_transactions):
+        excel_row = 23 + i
+        day += timedelta(days=rng.randint(20, 200))
+        put(excel_row, 2, f"{day:%d-%m-%y}")
+        kind = rng.random()
+        if kind < 0.5:
+            amount = round(rng.uniform(50, 5000), 2)
+            share += amount
+            put(excel_row, 3, "P/S")
+            put(excel_row, 4, f"R{rng.randint(10000, 99999)}")
+            put(excel_row, 6, amount)
+        elif kind < 0.8:
+            dividend = round(share * 0.03, 6)
+            share += dividend
+            put(excel_row, 3, "DIVIDEN")
+            put(excel_row, 5, day.year - 1)
+            put(excel_row, 6, dividend)
+            put(excel_row, 11, dividend)
+            put(excel_row, 12, 5.0)
+            put(excel_row, 13, dividend + 5.0)
+        elif share > 100:
+            amount = round(rng.uniform(10, share / 2), 2)
+            share -= amount
+            put(excel_row, 3, "PENGELUARAN")
+            put(excel_row, 7, amount)
+        put(excel_row, 8, round(share, 6))
+        put(excel_row, 9, bonus)
+        put(excel_row, 10, round(share + bonus, 6))
+        if rng.random() < 0.2:
+            put(excel_row, 14, f"CATATAN {rng.randint(1, 999)}")
+    return rows
+
+
+def generate_workbook(path, n_sheets, min_transactions=10, max_transactions=60, seed=0):
+    # Writes an .xlsx of n_sheets synthetic member statements (sheets "5000", "5001", ...)
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    for i in range(n_sheets):
+        member_no = 5000 + i
+        worksheet = workbook.create_sheet(str(member_no))
+        for row in synthetic_sheet_rows(rng, member_no, rng.randint(min_transactions, max_transactions)):
+            worksheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def peak_rss_mb():
+    peak = peak_rss()
+    return round(peak / MB, 1) if peak is not None else None
+
+
+def run_benchmark(excel_file, output_file, engine='pandas', output_format='object', encoder='json', read_plan=False):
+    """
+    Converts every sheet of excel_file the way main.py does, timing each stage separately.
+    Returns the report dict (see STAGES) with the run's instrument counters; the formatter's
+    log output is switched off for the run. A planned openpyxl or xml read (read_plan=True) builds the
+    grid while it streams the rows, so its to_grid time is part of read.
+    """
+    logging.disable(logging.CRITICAL)
+    STATS.reset()
+    timings = dict.fromkeys(STAGES, 0.0)
+    sheets = statements = transactions = 0
+    started = time.perf_counter()
+    xls = open_workbook(excel_file, engine)
+    timings["open"] = time.perf_counter() - started
+    try:
+        # Indented as main.py writes it; orjson only knows a 2-space indent
+        with StatementWriter(output_file, output_format, 2 if encoder == 'orjson' else 4, encoder) as writer:
+            for sheet_name in workbook_sheet_names(xls):
+                t0 = time.perf_counter()
+                if _is_pandas_workbook(xls):
+                    frame = _import_pandas().read_excel(xls, sheet_name=sheet_name)
+                    t1 = time.perf_counter()
+                    grid = frame_to_grid(frame)
+                elif read_plan:
+                    grid = planned_rows_to_grid(iter_sheet_rows(xls, sheet_name), STATEMENT_READ_PLAN)
+                    t1 = time.perf_counter()
+                else:
+                    rows = list(iter_sheet_rows(xls, sheet_name))
+                    t1 = time.perf_counter()
+                    grid = rows_to_grid(rows)
+                t2 = time.perf_counter()
+                clean_sheet_grid(grid)
+                t3 = time.perf_counter()
+                statement = format_dynamically(grid)
+                t4 = time.perf_counter()
+                if statement:
+                    writer.write(statement, sheet_name)
+                    statements += 1
+                    transactions += len(statement.get("TRANSACTIONS") or ())
+                t5 = time.perf_counter()
+                timings["read"] += t1 - t0
+                timings["to_grid"] += t2 - t1
+                timings["clean"] += t3 - t2
+                timings["format"] += t4 - t3
+                timings["write"] += t5 - t4
+                sheets += 1
+    finally:
+        xls.close()
+        logging.disable(logging.NOTSET)
+    total = time.perf_counter() - started
+
+    return {
+        "workbook": excel_file,
+        "engine": engine,
+        "read_plan": bool(read_plan) and engine != 'pandas',
+        "sheets": sheets,
+        "statements": statements,
+        "transactions": transactions,
+        "total_s": round(total, 4),
+        "throughput_sheets_per_s": round(sheets / total, 2) if total else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {
+            stage: {"total_s": round(seconds, 4), "per_sheet_ms": round(seconds * 1000 / sheets, 3) if sheets else None}
+            for stage, seconds in timings.items()
+        },
+        "counters": STATS.summary()["counters"],
+    }
+
+
+def run_memory_check(excel_file, output_file, max_rss_mb):
+    """
+    Converts every sheet of excel_file with main.py --low-memory (budget: max_rss_mb) in a fresh
+    process, so that only the conversion counts towards its peak RSS. Returns the child's exit
+    code, its peak RSS in MB and its --stats summary.
+    """
+    stats_file = output_file + ".stats.json"
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"), excel_file, "*", output_file,
+               "-b", "--combined", "--low-memory", "--memory-budget", str(max_rss_mb), "--stats", stats_file]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        with open(stats_file, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print(completed.stdout)
+        return completed.returncode, None, {}
+    if completed.returncode != 0:
+        print("\n".join(line for line in completed.stdout.splitlines() if line.startswith("Error:")))
+    return completed.returncode, stats.get("peak_rss_mb"), stats
+
+
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Lines describing each metric against the baseline, and the metrics that regressed by more than tolerance
+    lines = []
+    regressions = []
+
+    def compare(name, current, previous, higher_is_better=False):
+        if current is None or not previous:
+            return
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(f"  {name:<24} {previous:>12.4f} -> {current:>12.4f}  ({change:+.1%}){flag}")
+
+    for stage in STAGES:
+        compare(f"{stage} (ms/sheet)", report["stages"][stage]["per_sheet_ms"], baseline.get("stages", {}).get(stage, {}).get("per_sheet_ms"))
+    compare("throughput (sheets/s)", report["throughput_sheets_per_s"], baseline.get("throughput_sheets_per_s"), higher_is_better=True)
+    compare("peak RSS (MB)", report["peak_rss_mb"], baseline.get("peak_rss_mb"))
+    return lines, regressions
+
+
+def print_report(report):
+    print(f"{report['sheets']} sheets ({report['statements']} statements, {report['transactions']} transactions) "
+          f"from '{report['workbook']}' with the {report['engine']} reader in {report['total_s']:.2f}s")
+    print(f"  throughput: {report['throughput_sheets_per_s']} sheets/s, peak RSS: {report['peak_rss_mb']} MB")
+    for stage in STAGES:
+        timing = report["stages"][stage]
+        print(f"  {stage:<8} {timing['total_s']:>10.4f}s  {timing['per_sheet_ms']:>10.3f} ms/sheet")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline stage by stage on a synthetic (or given) workbook.")
+    parser.add_argument("-n", "--sheets", type=int, help=f"Number of synthetic member sheets (default: {DEFAULT_SHEETS}, {MEMORY_CHECK_SHEETS} with --memory-check).")
+    parser.add_argument("--min-transactions", type=int, default=10, help="Fewest transactions per synthetic sheet (default: 10).")
+    parser.add_argument("--max-transactions", type=int, default=60, help="Most transactions per synthetic sheet (default: 60).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic workbook (default: 0).")
+    parser.add_argument("--workbook", help="Benchmark this workbook instead of a synthetic one.")
+    parser.add_argument("--workdir", help="Where synthetic workbooks are kept and reused (default: the system temp directory).")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="pandas", help="Sheet reader to benchmark (default: pandas).")
+    parser.add_argument("--read-plan", action="store_true", help="With --reader openpyxl or xml, read only the cells the statement template uses.")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="object", help="Output layout to write (default: object).")
+    parser.add_argument("--encoder", choices=ENCODERS, default="json", help="JSON encoder to benchmark (default: json).")
+    parser.add_argument("-o", "--output", help="Also save the report as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against a report saved earlier; exits with 1 on a regression.")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Save this run's report as the baseline in FILE.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"Allowed slowdown before a metric counts as a regression (default: {DEFAULT_TOLERANCE}).")
+    parser.add_argument("--memory-check", type=int, metavar="MB", help="Instead of timing the stages, convert the workbook with main.py --low-memory in a fresh process and exit with 1 if its peak RSS goes over MB.")
+    args = parser.parse_args()
+    if args.sheets is None:
+        args.sheets = MEMORY_CHECK_SHEETS if args.memory_check else DEFAULT_SHEETS
+    if args.read_plan and args.reader == 'pandas' and not args.memory_check:
+        print("Warning: --read-plan has no effect with --reader pandas, which always reads whole sheets; use --reader openpyxl or xml.")
+
+    excel_file = args.workbook
+    if excel_file is None:
+        workdir = args.workdir or tempfile.gettempdir()
+        os.makedirs(workdir, exist_ok=True)
+        excel_file = os.path.join(workdir, f"xlsx2json-bench-{args.sheets}-{args.min_transactions}-{args.max_transactions}-{args.seed}.xlsx")
+        if not os.path.exists(excel_file):
+            print(f"Generating {args.sheets} synthetic sheets into '{excel_file}'...")
+            # In a separate process so the generator's memory doesn't count towards the peak RSS
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                executor.submit(generate_workbook, excel_file + ".tmp", args.sheets, args.min_transactions, args.max_transactions, args.seed).result()
+            os.replace(excel_file + ".tmp", excel_file)
+    elif not os.path.exists(excel_file):
+        print(f"Error: File '{excel_file}' not found.")
+        raise SystemExit(1)
+
+    if args.memory_check:
+        with tempfile.TemporaryDirectory() as output_dir:
+            started = time.perf_counter()
+            returncode, peak, stats = run_memory_check(excel_file, os.path.join(output_dir, "statements.json"), args.memory_check)
+        print(f"Converted '{excel_file}' in low-memory mode in {time.perf_counter() - started:.2f}s: peak RSS {peak} MB (limit: {args.memory_check} MB)")
+        if returncode != 0 or peak is None or peak > args.memory_check:
+            print("Memory check FAILED" + (f" (main.py exited with {returncode})" if returncode else ""))
+            raise SystemExit(1)
+        print("Memory check passed")
+        return
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        report = run_benchmark(excel_file, os.path.join(output_dir, "statements.json"), args.reader, args.format, args.encoder, args.read_plan)
+    print_report(report)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error: Could not read the baseline '{args.baseline}': {e}")
+            raise SystemExit(1)
+        lines, regressions = compare_to_baseline(report, baseline, args.tolerance)
+        print(f"Compared to '{args.baseline}':")
+        print("\n".join(lines))
+        if regressions:
+            print(f"Regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,26 @@ def is_list_of_only_zeros(value):
     # All elements must be the integer 0 or float 0.0
     return all((type(element) is int or type(element) is float) and element == 0 for element in value)
 
-def clean_json_data(data):
+class _CleanFrame:
+    """
+    One dict or list being cleaned by clean_json_data. `entries` is a live iterator over its
+    (key, value) pairs (list items are keyed by index) that the main loop resumes after
+    finishing a nested container.
+    """
+    __slots__ = ("source", "is_dict", "entries", "target", "pending_key",
+                 "deleted_keys", "write_idx", "all_zeros")
+
+    def __init__(self, source, in_place):
+        self.source = source
+        self.is_dict = isinstance(source, dict)
+        self.entries = iter(source.items()) if self.is_dict else enumerate(source)
+        self.target = source if in_place else ({} if self.is_dict else [])
+        self.pending_key = None
+        self.deleted_keys = []
+        self.write_idx = 0 # list items kept so far (also the in-place write position)
+        self.all_zeros = True # whether every kept list item is the number 0
+
+def clean_json_data(data, in_place=False):
     """
     Recursively:
     1. Removes keys from dictionaries where the value is None.
@@ -18,59 +37,99 @@ def clean_json_data(data):
     3. Removes keys from dictionaries where the value, after cleaning, is a list of only zeros.
     4. Removes None items from lists.
     5. Removes items from lists where the item, after cleaning, is a list of only zeros.
+
+    Walks the data with an explicit stack, so deep nesting can't hit the recursion limit.
+    With in_place=True the dicts and lists are pruned where they are instead of being copied,
+    and the (same) top-level object is returned.
     """
-    if isinstance(data, dict):
-        cleaned_dict = {}
-        for key, value in data.items():
-            # Rule 1: Skip if original value is None
-            if value is None:
-                continue
-            
-            # Rule 2 (New): Skip if original value is the number 0 (int or float)
-            # This check ensures we don't remove boolean False.
-            if (type(value) is int or type(value) is float) and value == 0:
-                continue
-            
-            cleaned_value = clean_json_data(value)  # Recursively clean the value
-            
-            # Rule 3: After cleaning, if the value became a list of only zeros, skip this key
-            if is_list_of_only_zeros(cleaned_value):
-                continue
-            
-            # Safeguard: if cleaned_value became None after deeper cleaning
-            # (e.g., an object that became empty and was set to None - though current logic doesn't make non-None things None)
-            if cleaned_value is None and value is not None: 
-                 continue
-
-            cleaned_dict[key] = cleaned_value
-        return cleaned_dict
-    elif isinstance(data, list):
-        cleaned_list = []
-        for item in data:
-            # Rule 4: Skip if original item is None
-            if item is None:
-                continue
-            
-            # Rule (Implicit from above): if item is the number 0, it's kept in the list
-            # unless the overall list itself becomes a list_of_only_zeros at a higher level.
-            # The request "remove these: '216':0" was specific to key-value pairs.
-            
-            cleaned_item = clean_json_data(item)  # Recursively clean the item
-            
-            # Rule 5: After cleaning, if the item became a list of only zeros, skip it
-            if is_list_of_only_zeros(cleaned_item):
-                continue
-
-            # Safeguard if item became None after cleaning deeper structures
-            if cleaned_item is None and item is not None:
-                 continue
-                
-            cleaned_list.append(cleaned_item)
-        return cleaned_list
-    else:
+    if not isinstance(data, (dict, list)):
         # Base case: For numbers (non-zero unless in a list), strings, booleans, etc.
         return data
 
+    stack = [_CleanFrame(data, in_place)]
+    while True:
+        frame = stack[-1]
+        nested = None
+        if frame.is_dict:
+            target = frame.target
+            for key, value in frame.entries:
+                # Rule 1: Skip if original value is None
+                # Rule 2: Skip if original value is the number 0 (int or float); this keeps boolean False
+                if value is None or ((type(value) is int or type(value) is float) and value == 0):
+                    if in_place:
+                        frame.deleted_keys.append(key)
+                    continue
+                if isinstance(value, (dict, list)):
+                    frame.pending_key, nested = key, value
+                    break
+                if not in_place:
+                    target[key] = value
+        else:
+            target = frame.target
+            write_idx = frame.write_idx
+            all_zeros = frame.all_zeros
+            for key, value in frame.entries:
+                # Rule 4: Skip if original item is None; zeros are kept unless the whole list is zeros
+                if value is None:
+                    continue
+                if isinstance(value, (dict, list)):
+                    frame.pending_key, nested = key, value
+                    break
+                if all_zeros and not ((type(value) is int or type(value) is float) and value == 0):
+                    all_zeros = False
+                if in_place:
+                    target[write_idx] = value
+                else:
+                    target.append(value)
+                write_idx += 1
+            frame.write_idx = write_idx
+            frame.all_zeros = all_zeros
+
+        if nested is not None:
+            # Clean the nested container first, then come back to this one
+            stack.append(_CleanFrame(nested, in_place))
+            continue
+
+        stack.pop()
+        if in_place:
+            if frame.is_dict:
+                for key in frame.deleted_keys:
+                    del frame.source[key]
+            else:
+                del frame.source[frame.write_idx:]
+        cleaned = frame.target
+        if not stack:
+            return cleaned
+
+        parent = stack[-1]
+        # Rules 3 and 5: After cleaning, if the value/item became a list of only zeros, skip it
+        if not frame.is_dict and frame.write_idx > 0 and frame.all_zeros:
+            if parent.is_dict and in_place:
+                parent.deleted_keys.append(parent.pending_key)
+        elif parent.is_dict:
+            if not in_place:
+                parent.target[parent.pending_key] = cleaned
+        else:
+            # A kept nested container means the parent list is not all zeros
+            parent.all_zeros = False
+            if in_place:
+                parent.target[parent.write_idx] = cleaned
+            else:
+                parent.target.append(cleaned)
+            parent.write_idx += 1
+
+def clean_sheet_grid(grid):
+    """
+    Applies clean_json_data's rules to a SheetGrid in place.
+    Sheet cells never hold lists or dicts, so this only empties cells holding the number 0
+    (None cells are already empty). Returns the same grid.
+    """
+    cells = grid.cells
+    for i, value in enumerate(cells):
+        if (type(value) is int or type(value) is float) and value == 0:
+            cells[i] = None
+    return grid
+
 def main():
     parser = argparse.ArgumentParser(
         description="Clean a JSON file by recursively removing: "
@@ -105,7 +164,7 @@ def main():
         print(f"An error occurred while reading the input file: {e}")
         return
 
-    processed_data = clean_json_data(json_data)
+    processed_data = clean_json_data(json_data, in_place=True) # json_data isn't needed afterwards
 
     try:
         if args.output_file:
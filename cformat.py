@@ -1,8 +1,16 @@
 import json
 import argparse
+import functools
+import hashlib
+import logging
 from pathlib import Path
 from datetime import datetime, timedelta # Added timedelta for Excel serial dates
 import re
+import threading
+from instrument import STATS, configure_logging
+from sheetgrid import ReadPlan, SheetGrid
+
+logger = logging.getLogger(__name__)
 
 # --- Constants for known labels and headers ---
 # Key for the column often containing member labels and transaction dates
@@ -18,13 +26,22 @@ MEMBER_LABELS_MAP = {
     "NO. TELEFON PENAMA ": "NO_TELEFON_PENAMA_RAW", # Note the trailing space, as seen in JSON sample
     "TARIKH MASUK": "TARIKH MASUK", "TARIKH LULUS ALK": "TARIKH LULUS ALK"
 }
-# Expected row indices (as strings) for these labels within the KOPERASI_KEY object
+# Expected row indices for these labels within the KOPERASI_KEY column
 MEMBER_LABELS_EXPECTED_ROW_INDICES = {
-    "NO. ANGGOTA": "5", "GELARAN": "6", "NAMA": "7", "NO. K/P": "8",
-    "TARIKH LAHIR": "9", "ALAMAT TETAP": "10", "ALAMAT SURAT MENYURAT": "11",
-    "NO. TELEFON ANGGOTA": "12", "PERKERJAAN": "13", "PENAMA / K.P": "14",
-    "NO. TELEFON PENAMA ": "15", "TARIKH MASUK": "16", "TARIKH LULUS ALK": "17"
+    "NO. ANGGOTA": 5, "GELARAN": 6, "NAMA": 7, "NO. K/P": 8,
+    "TARIKH LAHIR": 9, "ALAMAT TETAP": 10, "ALAMAT SURAT MENYURAT": 11,
+    "NO. TELEFON ANGGOTA": 12, "PERKERJAAN": 13, "PENAMA / K.P": 14,
+    "NO. TELEFON PENAMA ": 15, "TARIKH MASUK": 16, "TARIKH LULUS ALK": 17
 }
+# Header-less columns ("Unnamed: 3", "Unnamed: 4") where the member values usually sit
+PREFERRED_MEMBER_VALUE_COLS = (3, 4)
+# Rows, relative to the NO. ANGGOTA label, searched for the member number in this order: the label's
+# own row, then the row below and above it (the json_5000 anomaly)
+MEMBER_VALUE_ROW_OFFSETS = (0, 1, -1)
+# json_5000 anomaly: when the member number sits one row below its label, the values of these labels
+# may sit one row above theirs. Only applies when the member values are in ROW_ABOVE_VALUE_COL.
+ROW_ABOVE_VALUE_LABELS = ("GELARAN",)
+ROW_ABOVE_VALUE_COL = 4
 
 # Transaction headers to search for and their desired output keys
 TRANSACTION_HEADERS_MAP = {
@@ -38,26 +55,62 @@ MULTI_PART_TX_HEADERS = {
     "WANG": {"MASUK": "WANG MASUK"},
     "BAKI": {"SYER": "BAKI SYER", "BONUS": "BAKI BONUS", "SEMUA": "BAKI SEMUA"}
 }
-TX_HEADER_TYPICAL_ROW_INDICES = ("19", "20") # Headers often on these row indices
-
-# --- Utility Functions ---
-def convert_excel_timestamp(value, date_format='%d-%b-%y'):
-    if value is None: return None
-    if isinstance(value, str):
-        try:
-            common_formats = ['%d-%m-%y', '%d/%m/%y', '%d-%b-%y', '%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y', '%d/%m/%Y']
-            dt_object = None
-            for fmt in common_formats:
+TX_HEADER_TYPICAL_ROW_INDICES = (19, 20) # Headers often on these row indices
+ADDITIONAL_DATA_KEYS = ("ADDITIONAL_DATA_1", "ADDITIONAL_DATA_2", "ADDITIONAL_DATA_3") # Unlabelled columns right of BAKI SEMUA
+LAYOUT_CACHE_SIZE = 1024 # Max compiled sheet layouts kept per layout profile
+
+# --- Date normalization ---
+# Input formats tried for string dates, in priority order
+DATE_INPUT_FORMATS = ('%d-%m-%y', '%d/%m/%y', '%d-%b-%y', '%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y', '%d/%m/%Y')
+EXCEL_EPOCH = datetime(1899, 12, 30) # Day 0 of Excel serial dates (Windows default)
+EXCEL_EPOCH_ORDINAL = EXCEL_EPOCH.toordinal()
+DATE_CACHE_SIZE = 65536 # Max memoized (value, output format) conversions
+
+def _earlier_lookalike_formats(fmt):
+    # Earlier formats that only swap %d and %m (e.g. '%m/%d/%Y' before '%d/%m/%Y') can match the very
+    # same strings, so they must still be tried first when fmt is used as a shortcut.
+    shape = fmt.replace('%d', '%?').replace('%m', '%?')
+    earlier = DATE_INPUT_FORMATS[:DATE_INPUT_FORMATS.index(fmt)]
+    return tuple(f for f in earlier if f.replace('%d', '%?').replace('%m', '%?') == shape)
+
+_FORMATS_TO_TRY_WITH_HINT = {fmt: _earlier_lookalike_formats(fmt) + (fmt,) for fmt in DATE_INPUT_FORMATS}
+
+class DateNormalizer:
+    # Parses date strings with DATE_INPUT_FORMATS, trying the format that matched last time first.
+    # Keep one per sheet or column so the hint follows that column's layout.
+    __slots__ = ('last_format',)
+
+    def __init__(self):
+        self.last_format = None
+
+    def parse(self, text):
+        if self.last_format is not None:
+            for fmt in _FORMATS_TO_TRY_WITH_HINT[self.last_format]:
                 try:
-                    dt_object = datetime.strptime(value, fmt)
-                    break
+                    dt_object = datetime.strptime(text, fmt)
+                    self.last_format = fmt
+                    return dt_object
                 except ValueError:
                     continue
-            if dt_object:
-                return dt_object.strftime(date_format).upper()
-            return value.upper() 
-        except ValueError:
-            return value.upper()
+        for fmt in DATE_INPUT_FORMATS:
+            try:
+                dt_object = datetime.strptime(text, fmt)
+                self.last_format = fmt
+                return dt_object
+            except ValueError:
+                continue
+        return None
+
+_default_date_normalizer = DateNormalizer()
+_date_cache = {}
+_date_cache_lock = threading.Lock()
+
+def _convert_timestamp_uncached(value, date_format, normalizer):
+    if isinstance(value, str):
+        dt_object = normalizer.parse(value)
+        if dt_object:
+            return dt_object.strftime(date_format).upper()
+        return value.upper()
             
     if isinstance(value, (int, float)):
         try:
@@ -66,7 +119,10 @@ def convert_excel_timestamp(value, date_format='%d-%b-%y'):
                 dt_object = datetime.fromtimestamp(value / 1000)
             # Heuristic for Excel serial date numbers (days since 1899-12-30 for Windows default)
             elif value > 10000 and value < 70000: # Approx range for 20th/21st century dates
-                dt_object = datetime(1899, 12, 30) + timedelta(days=value)
+                if value == int(value):
+                    dt_object = datetime.fromordinal(EXCEL_EPOCH_ORDINAL + int(value))
+                else:
+                    dt_object = EXCEL_EPOCH + timedelta(days=value)
             else: # If not clearly identifiable as a common timestamp type
                 return str(int(value)) if isinstance(value, float) and value == int(value) else str(value)
             return dt_object.strftime(date_format).upper()
@@ -74,6 +130,37 @@ def convert_excel_timestamp(value, date_format='%d-%b-%y'):
             return str(value)
     return str(value)
 
+def convert_excel_timestamp(value, date_format='%d-%b-%y', normalizer=None):
+    if value is None: return None
+    # Memoized per (type, value, format): True/1 and 5000/5000.0 must not share an entry
+    cache_key = (type(value), value, date_format)
+    try:
+        return _date_cache[cache_key]
+    except KeyError:
+        pass
+    except TypeError: # unhashable value, nothing to memoize
+        return _convert_timestamp_uncached(value, date_format, normalizer or _default_date_normalizer)
+    result = _convert_timestamp_uncached(value, date_format, normalizer or _default_date_normalizer)
+    if len(_date_cache) >= DATE_CACHE_SIZE:
+        # Drop the oldest entry; the --pipeline formatter threads share the cache
+        with _date_cache_lock:
+            try:
+                _date_cache.pop(next(iter(_date_cache)), None)
+            except (RuntimeError, StopIteration): # another thread added or cleared entries meanwhile
+                pass
+    _date_cache[cache_key] = result
+    return result
+
+def clear_date_cache():
+    # Frees the memoized conversions (they are rebuilt as dates come up again)
+    _date_cache.clear()
+
+def convert_excel_timestamps(values, date_format='%d-%b-%y'):
+    # Bulk version of convert_excel_timestamp for a whole column; the column shares one format hint
+    normalizer = DateNormalizer()
+    return [convert_excel_timestamp(value, date_format, normalizer) for value in values]
+
+# --- Utility Functions ---
 def parse_nominee_string(nominee_str):
     if not nominee_str or not isinstance(nominee_str, str):
         return {"NAME": None, "RELATIONSHIP": None, "IC": None}
@@ -83,75 +170,220 @@ def parse_nominee_string(nominee_str):
         return {"NAME": name.strip(),"RELATIONSHIP": relationship.strip(),"IC": ic.strip()}
     return {"NAME": nominee_str.strip(), "RELATIONSHIP": None, "IC": None}
 
-def find_member_data(raw_data, koperasi_col_obj):
+class SheetLayout:
+    # Where the statement data of one shape of sheet sits, worked out once by LayoutProfile.sheet_layout:
+    # the cells that may hold the member number (in search order), the member labels present as
+    # (label, output key, row), the located transaction columns and the row their data starts on.
+    __slots__ = ('profile', 'member_value_cells', 'member_label_cells', 'located_tx_cols', 'data_start_row')
+
+    def __init__(self, profile, member_value_cells, member_label_cells, located_tx_cols, data_start_row):
+        self.profile = profile
+        self.member_value_cells = member_value_cells
+        self.member_label_cells = member_label_cells
+        self.located_tx_cols = located_tx_cols
+        self.data_start_row = data_start_row
+
+
+class LayoutProfile:
+    """
+    One variant of the statement layout: the Koperasi title, the member labels and their rows,
+    where the member number may be, and the transaction headers and their rows. Settings missing
+    from a profile (see LAYOUT_PROFILES, or a JSON file for get_layout_profile) are the standard
+    layout's. sheet_layout() matches a sheet to a compiled SheetLayout on the cells the column and
+    row detection depends on, so later sheets of the same shape skip the detection altogether.
+    """
+    SETTINGS = ("name", "koperasi_key", "member_labels", "member_label_rows", "member_value_cols",
+                "member_value_row_offsets", "row_above_value_labels", "row_above_value_col", "transaction_headers",
+                "multi_part_headers", "header_rows")
+
+    def __init__(self, name, koperasi_key=KOPERASI_KEY, member_labels=MEMBER_LABELS_MAP,
+                 member_label_rows=MEMBER_LABELS_EXPECTED_ROW_INDICES, member_value_cols=PREFERRED_MEMBER_VALUE_COLS,
+                 member_value_row_offsets=MEMBER_VALUE_ROW_OFFSETS, row_above_value_labels=ROW_ABOVE_VALUE_LABELS,
+                 row_above_value_col=ROW_ABOVE_VALUE_COL, transaction_headers=TRANSACTION_HEADERS_MAP,
+                 multi_part_headers=MULTI_PART_TX_HEADERS, header_rows=TX_HEADER_TYPICAL_ROW_INDICES):
+        self.name = name
+        self.koperasi_key = koperasi_key
+        self.member_labels = dict(member_labels)
+        self.member_label_rows = dict(member_label_rows)
+        self.member_value_cols = tuple(member_value_cols)
+        self.member_value_row_offsets = tuple(member_value_row_offsets)
+        self.row_above_value_labels = tuple(row_above_value_labels)
+        self.row_above_value_col = row_above_value_col
+        self.transaction_headers = dict(transaction_headers)
+        self.multi_part_headers = {first: dict(options) for first, options in multi_part_headers.items()}
+        self.header_rows = tuple(header_rows)
+        if "NO. ANGGOTA" not in self.member_labels or "NO. ANGGOTA" not in self.member_label_rows or not self.header_rows:
+            raise ValueError(f"Layout profile '{name}' needs a NO. ANGGOTA label row and at least one header row.")
+
+        # Compiled lookups
+        self.label_cells = tuple(
+            (label, output_key, self.member_label_rows[label])
+            for label, output_key in self.member_labels.items() if label in self.member_label_rows
+        )
+        no_anggota_row = self.member_label_rows["NO. ANGGOTA"]
+        self.member_value_rows = tuple(no_anggota_row + offset for offset in self.member_value_row_offsets)
+        self.indexed_header_rows = tuple(sorted(set(self.header_rows) | {row + 1 for row in self.header_rows}))
+        # Cell texts that can change where the transaction columns are found; any other text is as good as an empty cell
+        self.header_texts = set(self.transaction_headers) | set(self.multi_part_headers)
+        self.header_texts.update(second for options in self.multi_part_headers.values() for second in options)
+        # Every row the detection looks at, which is what a planned read must take in full
+        self.probe_rows = max(max(row for _, _, row in self.label_cells), *self.member_value_rows, *self.indexed_header_rows) + 1
+        self.plan_key = "planned:" + hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self._layouts = {}
+
+    @classmethod
+    def from_dict(cls, settings):
+        if not isinstance(settings, dict):
+            raise ValueError("A layout profile must be a JSON object of settings.")
+        unknown = set(settings) - set(cls.SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown layout profile settings {sorted(unknown)}. Expected some of {cls.SETTINGS}.")
+        try:
+            return cls(**{"name": "custom", **settings})
+        except (TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid layout profile settings: {e}")
+
+    def to_dict(self):
+        return {setting: getattr(self, setting) for setting in self.SETTINGS}
+
+    def __getstate__(self):
+        # Pool workers get the settings only and compile their own layouts
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def read_plan(self):
+        # Reads only the cells of a sheet this layout uses (see aexcel.read_sheet_grid)
+        return ReadPlan(self.probe_rows, functools.partial(plan_sheet_read, profile=self), self.plan_key)
+
+    def clear_layouts(self):
+        # Frees the compiled layouts; the next sheet of each shape compiles its layout again
+        self._layouts.clear()
+
+    def sheet_layout(self, grid, koperasi_col):
+        # The compiled layout of grid, keyed by everything the detection depends on: the column headers,
+        # which member labels are where they should be and the header texts in the header rows.
+        n_rows = grid.n_rows
+        cells = grid.cells
+        header_texts = self.header_texts
+        signature = (
+            koperasi_col,
+            tuple(grid.columns),
+            tuple(grid.get(row, koperasi_col) == label for label, _, row in self.label_cells),
+            tuple(
+                tuple(value.strip() if isinstance(value, str) and value.strip() in header_texts else None for value in cells[row::n_rows])
+                if row < n_rows else ()
+                for row in self.indexed_header_rows
+            ),
+        )
+        layout = self._layouts.get(signature)
+        if layout is not None:
+            STATS.count("layout_cache_hits")
+            return layout
+        layout = self._compile_layout(grid, koperasi_col, signature[2])
+        if len(self._layouts) >= LAYOUT_CACHE_SIZE:
+            self._layouts.clear()
+        self._layouts[signature] = layout
+        STATS.count("layouts_compiled")
+        logger.debug("[LAYOUT] Compiled a new '%s' layout (%d so far) with transaction columns %s",
+                     self.name, len(self._layouts), {key: info["col"] for key, info in layout.located_tx_cols.items()})
+        return layout
+
+    def _compile_layout(self, grid, koperasi_col, label_matches):
+        member_label_cells = tuple(cell for cell, matched in zip(self.label_cells, label_matches) if matched)
+
+        # Member number candidates: the rows around the NO. ANGGOTA label, preferring
+        # "Unnamed: 3" or "Unnamed: 4", then any other header-less column
+        member_value_cells = ()
+        if any(label == "NO. ANGGOTA" for label, _, _ in member_label_cells):
+            preferred_value_cols = [col for col in self.member_value_cols if grid.is_unnamed(col)]
+            other_potential_value_cols = [col for col in range(grid.n_cols) if grid.is_unnamed(col) and col not in preferred_value_cols]
+            member_value_cells = tuple((row, col) for row in self.member_value_rows for col in preferred_value_cols + other_potential_value_cols)
+
+        # Map: "TARIKH" -> {"col": 2, "header_row": 19, "offset": 1}
+        located_tx_cols = locate_transaction_columns(build_header_index(grid, self.header_rows), self)
+        # Identify columns for "ADDITIONAL_DATA_1, 2, 3" relative to "BAKI SEMUA"
+        # (the header-less columns directly to its right, when BAKI SEMUA itself has no column header)
+        baki_semua_info = located_tx_cols.get("BAKI SEMUA")
+        if baki_semua_info and grid.is_unnamed(baki_semua_info["col"]):
+            for distance, add_key in enumerate(ADDITIONAL_DATA_KEYS, start=1):
+                add_col = baki_semua_info["col"] + distance
+                located_tx_cols[add_key] = {
+                    "col": add_col if grid.is_unnamed(add_col) else None,
+                    "header_row": baki_semua_info["header_row"], "offset": baki_semua_info["offset"]
+                }
+        # Data starts on the row after the last header row
+        all_header_row_indices = [info["header_row"] for info in located_tx_cols.values() if info.get("header_row")]
+        data_start_row = max(all_header_row_indices) + 1 if all_header_row_indices else None
+        return SheetLayout(self, member_value_cells, member_label_cells, located_tx_cols, data_start_row)
+
+
+def _find_member_number(grid, layout):
+    # The first plausible member number among the layout's candidate cells as (row, col, value), or
+    # None; and the number of cells checked
+    for cells_checked, (row, col) in enumerate(layout.member_value_cells, 1):
+        val = grid.get(row, col)
+        if isinstance(val, int) and 1000 <= val <= 99999: # Plausible member no.
+            return (row, col, val), cells_checked
+    return None, len(layout.member_value_cells)
+
+def find_member_data(grid, koperasi_col, layout=None):
+    # layout: the grid's SheetLayout, looked up in the standard profile when not given
+    layout = layout or DEFAULT_LAYOUT_PROFILE.sheet_layout(grid, koperasi_col)
+    profile = layout.profile
     member_details = {}
     raw_nominee_details = {}
     
     # 1. Attempt to identify the primary Member Value Column
-    member_value_col_key_found = None
-    no_anggota_label_row = MEMBER_LABELS_EXPECTED_ROW_INDICES.get("NO. ANGGOTA")
+    # The first plausible member number among the candidate cells: the NO. ANGGOTA label's row, the row
+    # below (json_5000 anomaly where the value was at label_row+1) and the row above (json_5000 anomaly
+    # where the GELARAN value was at label_row-1); "Unnamed: 3" or "Unnamed: 4" first on each row
+    member_value_col_found = None
+    no_anggota_value_row_idx = None
+    found, cells_checked = _find_member_number(grid, layout)
+    if found is not None:
+        # We'll store this found value's row index for potential relative lookups
+        no_anggota_value_row_idx, member_value_col_found, val = found
+        member_details[profile.member_labels["NO. ANGGOTA"]] = val
     
-    if no_anggota_label_row and koperasi_col_obj.get(no_anggota_label_row) == "NO. ANGGOTA":
-        # Search horizontally for an integer value that could be the member number
-        # Check same row, row below (for json_5000 anomaly where value was at label_row+1)
-        # and row above (for json_5000 anomaly where GELARAN value was at label_row-1)
-        row_indices_to_check_for_value = [
-            no_anggota_label_row,
-            str(int(no_anggota_label_row) + 1),
-            str(int(no_anggota_label_row) - 1) 
-        ]
-        # Prefer "Unnamed: 3" or "Unnamed: 4" if member number is found there
-        preferred_value_cols = ["Unnamed: 3", "Unnamed: 4"] 
-        other_potential_value_cols = [k for k in raw_data.keys() if k.startswith("Unnamed:") and k not in preferred_value_cols]
-        
-        for r_idx_val_check in row_indices_to_check_for_value:
-            for col_key_cand in preferred_value_cols + other_potential_value_cols:
-                col_obj_cand = raw_data.get(col_key_cand, {})
-                val = col_obj_cand.get(r_idx_val_check)
-                if isinstance(val, int) and 1000 <= val <= 99999: # Plausible member no.
-                    member_value_col_key_found = col_key_cand
-                    # Store actual row index where NO. ANGGOTA value was found
-                    member_details[MEMBER_LABELS_MAP["NO. ANGGOTA"]] = val
-                    # This is a bit heuristic, assumes NO. ANGGOTA is the first reliable find
-                    # We'll store this found value's row index for potential relative lookups
-                    no_anggota_value_row_idx = r_idx_val_check 
-                    break
-            if member_value_col_key_found:
-                break
-    
-    if not member_value_col_key_found:
-        print("[WARNING] Could not dynamically identify the primary Member Value Column. Member details might be incomplete.")
+    if member_value_col_found is None:
+        logger.warning("Could not dynamically identify the primary Member Value Column. Member details might be incomplete.")
+        STATS.count("member_value_col_not_found")
         # As a last resort, try the columns used in previous examples if all else fails
-        if raw_data.get("Unnamed: 4", {}).get(MEMBER_LABELS_EXPECTED_ROW_INDICES.get("NAMA")): # Check if "Unnamed: 4" looks like a value col
-            member_value_col_key_found = "Unnamed: 4"
-        elif raw_data.get("Unnamed: 3", {}).get(MEMBER_LABELS_EXPECTED_ROW_INDICES.get("NAMA")):
-             member_value_col_key_found = "Unnamed: 3"
+        nama_row = profile.member_label_rows.get("NAMA")
+        for col in reversed(profile.member_value_cols): # Check if "Unnamed: 4" looks like a value col
+            if nama_row is not None and grid.is_unnamed(col) and grid.get(nama_row, col):
+                member_value_col_found = col
+                STATS.count(f"fallback_unnamed_{col}")
+                break
 
 
     # 2. Extract other member details using the identified (or fallback) value column
-    member_value_col_data = raw_data.get(member_value_col_key_found, {}) if member_value_col_key_found else {}
-    print(f"[DEBUG MEMBER] Using member value column: '{member_value_col_key_found}' with data: {str(list(member_value_col_data.items())[:5])[:100]}...")
+    if logger.isEnabledFor(logging.DEBUG):
+        member_value_col_data = grid.column(member_value_col_found) if member_value_col_found is not None else []
+        member_value_col_preview = [(row, val) for row, val in enumerate(member_value_col_data) if val is not None][:5]
+        logger.debug("[MEMBER] Using member value column: %s with data: %s...", member_value_col_found, str(member_value_col_preview)[:100])
 
 
-    for label_text, output_key in MEMBER_LABELS_MAP.items():
+    # Only the labels found at their expected row in the Koperasi column
+    for label_text, output_key, expected_label_row_idx in layout.member_label_cells:
         if output_key in member_details: # Already found (like NO. ANGGOTA)
             continue
 
-        expected_label_row_idx = MEMBER_LABELS_EXPECTED_ROW_INDICES.get(label_text)
-        if not expected_label_row_idx or koperasi_col_obj.get(expected_label_row_idx) != label_text:
-            # print(f"[DEBUG MEMBER] Label '{label_text}' not found at expected row '{expected_label_row_idx}' in KOPERASI_KEY column.")
-            continue
-
         # Default: try to get value from the same row index as the label
-        value = member_value_col_data.get(expected_label_row_idx)
+        value = grid.get(expected_label_row_idx, member_value_col_found) if member_value_col_found is not None else None
+        cells_checked += 1
 
-        # Specific heuristic for GELARAN based on json_5000 structure if direct match fails
-        # (where NO.ANGGOTA label was "5", value in "Unnamed:4" was at "6";
-        #  GELARAN label was "6", value in "Unnamed:4" was at "5")
-        if label_text == "GELARAN" and value is None and member_value_col_key_found == "Unnamed: 4": # Typical for json_5000
-             # If NO.ANGGOTA value was found at its label_row+1, GELARAN value might be at its label_row-1
-            if no_anggota_value_row_idx == str(int(MEMBER_LABELS_EXPECTED_ROW_INDICES["NO. ANGGOTA"]) + 1) :
-                value = member_value_col_data.get(str(int(expected_label_row_idx) - 1))
+        # The profile's row-above rule if direct match fails (json_5000: NO.ANGGOTA label was "5",
+        # value in "Unnamed:4" was at "6"; GELARAN label was "6", value in "Unnamed:4" was at "5")
+        if value is None and label_text in profile.row_above_value_labels and member_value_col_found == profile.row_above_value_col:
+             # If NO.ANGGOTA value was found at its label_row+1, this value might be at its label_row-1
+            if no_anggota_value_row_idx == profile.member_label_rows["NO. ANGGOTA"] + 1:
+                value = grid.get(expected_label_row_idx - 1, member_value_col_found)
+                cells_checked += 1
+                STATS.count("fallback_value_row_above")
 
 
         if output_key == "PENAMA_KP_RAW":
@@ -162,130 +394,220 @@ def find_member_data(raw_data, koperasi_col_obj):
             member_details[output_key] = convert_excel_timestamp(value, '%d-%b-%y')
         else:
             member_details[output_key] = value
-            
+
+    STATS.count("cells_scanned", cells_checked)
     return member_details, raw_nominee_details
 
 
-def find_transaction_columns_and_parse(raw_data, koperasi_col_obj):
-    located_tx_cols = {} # Map: "TARIKH" -> {"col_key": "...", "header_row": "...", "data_start_row_offset": 1 or 2}
-    
-    print("[DEBUG TX] Locating transaction headers...")
-    for col_key, col_data in raw_data.items():
-        if not isinstance(col_data, dict): continue
-        for row_idx_str, cell_value in col_data.items():
-            if not isinstance(cell_value, str) or not row_idx_str in TX_HEADER_TYPICAL_ROW_INDICES:
+def build_header_index(grid, header_rows=TX_HEADER_TYPICAL_ROW_INDICES):
+    # One pass over the header rows (plus the row below each, for second parts like "WANG"/"MASUK").
+    # Returns (text -> [(col, row), ...] in column-major order for the header rows,
+    #          (col, row) -> text for every indexed cell).
+    text_positions = {}
+    cell_text = {}
+    indexed_rows = sorted(set(header_rows) | {row + 1 for row in header_rows})
+    n_rows = grid.n_rows
+    cells = grid.cells
+    for col in range(grid.n_cols):
+        base = col * n_rows
+        for row in indexed_rows:
+            if row >= n_rows:
+                break
+            value = cells[base + row]
+            if not isinstance(value, str):
                 continue
-            
-            cell_value_stripped = cell_value.strip()
-            
-            # Check single line headers
-            if cell_value_stripped in TRANSACTION_HEADERS_MAP and cell_value_stripped not in located_tx_cols:
-                located_tx_cols[TRANSACTION_HEADERS_MAP[cell_value_stripped]] = {"key": col_key, "header_row": row_idx_str, "offset": 1}
-                # print(f"[DEBUG TX] Found header '{cell_value_stripped}' in col '{col_key}' at row '{row_idx_str}'")
-
-            # Check multi-part headers (e.g., "WANG" then "MASUK")
-            elif cell_value_stripped in MULTI_PART_TX_HEADERS:
-                second_part_options = MULTI_PART_TX_HEADERS[cell_value_stripped]
-                next_row_idx_str = str(int(row_idx_str) + 1)
-                cell_value_next_row = raw_data.get(col_key, {}).get(next_row_idx_str, "").strip()
-                for second_part, final_header_key in second_part_options.items():
-                    if cell_value_next_row == second_part and final_header_key not in located_tx_cols:
-                        located_tx_cols[final_header_key] = {"key": col_key, "header_row": next_row_idx_str, "offset": 1} # Data starts 1 row after the second part
-                        # print(f"[DEBUG TX] Found multi-part header '{final_header_key}' in col '{col_key}', part2 at row '{next_row_idx_str}'")
-
-
-    # Identify columns for "ADDITIONAL_DATA_1, 2, 3" relative to "BAKI SEMUA"
-    baki_semua_info = located_tx_cols.get("BAKI SEMUA")
-    if baki_semua_info:
-        baki_semua_col_key = baki_semua_info["key"]
-        if baki_semua_col_key.startswith("Unnamed: "):
-            try:
-                baki_semua_col_num = int(baki_semua_col_key.split(":")[1].strip())
-                located_tx_cols["ADDITIONAL_DATA_1"] = {"key": f"Unnamed: {baki_semua_col_num + 1}", "header_row": baki_semua_info["header_row"], "offset": baki_semua_info["offset"]}
-                located_tx_cols["ADDITIONAL_DATA_2"] = {"key": f"Unnamed: {baki_semua_col_num + 2}", "header_row": baki_semua_info["header_row"], "offset": baki_semua_info["offset"]}
-                located_tx_cols["ADDITIONAL_DATA_3"] = {"key": f"Unnamed: {baki_semua_col_num + 3}", "header_row": baki_semua_info["header_row"], "offset": baki_semua_info["offset"]}
-            except (IndexError, ValueError):
-                print(f"[WARNING TX] Could not determine additional data columns relative to BAKI SEMUA column '{baki_semua_col_key}'")
-    print(f"[DEBUG TX] Located transaction columns map: {json.dumps(located_tx_cols, indent=2)}")
+            text = value.strip()
+            cell_text[(col, row)] = text
+            if row in header_rows:
+                text_positions.setdefault(text, []).append((col, row))
+    STATS.count("cells_scanned", grid.n_cols * sum(1 for row in indexed_rows if row < n_rows))
+    return text_positions, cell_text
+
+
+def locate_transaction_columns(header_index, profile=None):
+    # Resolve the profile's transaction headers and multi-part headers against the header index.
+    # Where a header appears more than once, the first one in column-major order wins.
+    profile = profile or DEFAULT_LAYOUT_PROFILE
+    text_positions, cell_text = header_index
+    candidates = {} # final key -> ((col, row) of the header's first cell, col, header_row)
+    for header_text, output_key in profile.transaction_headers.items():
+        for col, row in text_positions.get(header_text, ()):
+            candidates.setdefault(output_key, ((col, row), col, row))
+            break
+    for first_part, second_part_options in profile.multi_part_headers.items():
+        for col, row in text_positions.get(first_part, ()):
+            final_header_key = second_part_options.get(cell_text.get((col, row + 1)))
+            if final_header_key is None:
+                continue
+            # Data starts 1 row after the second part
+            candidate = ((col, row), col, row + 1)
+            if final_header_key not in candidates or candidate < candidates[final_header_key]:
+                candidates[final_header_key] = candidate
+    return {
+        output_key: {"col": col, "header_row": header_row, "offset": 1}
+        for output_key, (_, col, header_row) in sorted(candidates.items(), key=lambda item: item[1])
+    }
+
+
+def plan_sheet_read(probe, profile=None):
+    """
+    The columns format_dynamically reads below the first probe_rows rows of a sheet, decided from
+    those rows (probe, a SheetGrid): the Koperasi column, the located transaction columns and the
+    ADDITIONAL_DATA columns next to BAKI SEMUA. Columns whose probe cells are all numbers are read
+    whole as well, since the rows below decide whether they come out as ints or floats.
+    A sheet without the Koperasi column needs nothing below the probe.
+    """
+    profile = profile or DEFAULT_LAYOUT_PROFILE
+    koperasi_col = probe.column_index(profile.koperasi_key)
+    if koperasi_col is None:
+        return set()
+    columns = {koperasi_col}
+    # The probe holds every cell the layout is matched on, so formatting the sheet finds it compiled
+    located_tx_cols = profile.sheet_layout(probe, koperasi_col).located_tx_cols
+    columns.update(info["col"] for info in located_tx_cols.values() if info["col"] is not None)
+    if "BAKI SEMUA" in located_tx_cols:
+        baki_semua_col = located_tx_cols["BAKI SEMUA"]["col"]
+        columns.update(range(baki_semua_col + 1, baki_semua_col + 1 + len(ADDITIONAL_DATA_KEYS)))
+    for col in range(probe.n_cols):
+        values = [value for value in probe.column(col) if value is not None]
+        if values and not any(isinstance(value, str) for value in values):
+            columns.add(col)
+    return columns
+
+
+# Built-in layout profiles. json_5000 sheets keep the member number one row below its label and
+# GELARAN one row above; standard sheets may have the same anomaly, so it keeps the rule as a fallback.
+LAYOUT_PROFILES = {
+    "standard": LayoutProfile("standard"),
+    "json_5000": LayoutProfile("json_5000", member_value_row_offsets=(1, 0, -1), row_above_value_labels=("GELARAN",),
+                               row_above_value_col=4),
+}
+DEFAULT_LAYOUT_PROFILE = LAYOUT_PROFILES["standard"]
+# Reads only the cells of a sheet the statement template uses (see aexcel.read_sheet_grid)
+STATEMENT_READ_PLAN = DEFAULT_LAYOUT_PROFILE.read_plan
+
+
+def detect_layout_profile(grid, profiles=None):
+    # The profile (of LAYOUT_PROFILES by default) that fits a statement sheet: the first one whose
+    # member number is on the row it checks first, else the first that finds a member number at all.
+    # None when the grid has no Koperasi column or no profile finds a member number.
+    found = None
+    for profile in profiles or LAYOUT_PROFILES.values():
+        koperasi_col = grid.column_index(profile.koperasi_key)
+        if koperasi_col is None:
+            continue
+        member_number, _ = _find_member_number(grid, profile.sheet_layout(grid, koperasi_col))
+        if member_number is None:
+            continue
+        if member_number[0] == profile.member_value_rows[0]:
+            return profile
+        found = found or profile
+    return found
+
+
+def get_layout_profile(layout):
+    # A built-in profile by name, or one loaded from a JSON file of LayoutProfile settings
+    if isinstance(layout, LayoutProfile):
+        return layout
+    if layout in LAYOUT_PROFILES:
+        return LAYOUT_PROFILES[layout]
+    if not Path(layout).is_file():
+        raise ValueError(f"Unknown layout profile '{layout}'. Choose from {tuple(LAYOUT_PROFILES)} or give a JSON profile file.")
+    with open(layout, 'r', encoding='utf-8') as f:
+        settings = json.load(f)
+    if isinstance(settings, dict):
+        settings.setdefault("name", Path(layout).stem)
+    return LayoutProfile.from_dict(settings)
+
+
+def find_transaction_columns_and_parse(grid, koperasi_col, layout=None):
+    layout = layout or DEFAULT_LAYOUT_PROFILE.sheet_layout(grid, koperasi_col)
+    # Map: "TARIKH" -> {"col": 2, "header_row": 19, "offset": 1}, plus the ADDITIONAL_DATA columns
+    located_tx_cols = layout.located_tx_cols
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TX] Located transaction columns map: %s", json.dumps(located_tx_cols, indent=2))
 
     # --- Extract Transaction Rows ---
     transactions = []
     if not located_tx_cols.get("TARIKH"):
-        print("[WARNING TX] TARIKH column for transactions not located. Cannot process transactions.")
+        logger.warning("[TX] TARIKH column for transactions not located. Cannot process transactions.")
+        STATS.count("tarikh_not_located")
         return []
 
     tarikh_col_info = located_tx_cols["TARIKH"]
-    tarikh_data_col_key = tarikh_col_info["key"]
-    # Determine data start row: typically the row after all headers are defined.
-    # For simplicity, let's assume data starts 1 or 2 rows after the "TARIKH" header.
-    # A more robust way is to find the max header row index across all located headers.
-    
-    all_header_row_indices = [int(info["header_row"]) for info in located_tx_cols.values() if info.get("header_row")]
-    if not all_header_row_indices: 
-        print("[WARNING TX] No transaction header row indices found.")
+    tarikh_data_col = tarikh_col_info["col"]
+    # Data starts on the row after the last header row of the located headers
+    data_start_row_num = layout.data_start_row
+    if data_start_row_num is None:
+        logger.warning("[TX] No transaction header row indices found.")
         return []
-        
-    max_header_row = max(all_header_row_indices)
-    data_start_row_num = max_header_row + 1 # Start looking for data from here
-    
-    print(f"[DEBUG TX] Max header row index found: {max_header_row}. Data rows start from index {data_start_row_num}.")
-
-    # Iterate through potential data row indices
-    # Get all numeric row keys from the TARIKH data column that are >= data_start_row_num
     
-    tarikh_data_col_content = raw_data.get(tarikh_data_col_key,{})
-    possible_data_row_indices = sorted(
-        [k for k in tarikh_data_col_content.keys() if k.isdigit() and int(k) >= data_start_row_num],
-        key=int
-    )
-    print(f"[DEBUG TX] Potential data row indices for transactions: {possible_data_row_indices}")
-
-
-    for r_idx_str in possible_data_row_indices:
+    logger.debug("[TX] Data rows start from index %s.", data_start_row_num)
+
+    # Work column-wise: slice every mapped column from the data start row once
+    tarikh_values = grid.column(tarikh_data_col, data_start_row_num)
+    # Rows (relative to data_start_row_num) where the TARIKH column holds a value
+    possible_data_rows = [i for i, value in enumerate(tarikh_values) if value is not None]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TX] Potential data row indices for transactions: %s", [data_start_row_num + i for i in possible_data_rows])
+
+    # Output field -> column values, in the original map order, plus the ADDITIONAL_DATA columns
+    tx_field_values = [
+        (output_key, grid.column(located_tx_cols[output_key]["col"], data_start_row_num))
+        for output_key in dict.fromkeys(layout.profile.transaction_headers.values()) if output_key in located_tx_cols
+    ]
+    additional_values = [
+        (add_key, grid.column(located_tx_cols[add_key]["col"], data_start_row_num))
+        for add_key in ADDITIONAL_DATA_KEYS
+        if add_key in located_tx_cols and located_tx_cols[add_key]["col"] is not None
+    ]
+
+    # Transaction TARIKH format DD-MM-YY, converted for the whole column in one go
+    tarikh_converted = dict(zip(possible_data_rows, convert_excel_timestamps([tarikh_values[i] for i in possible_data_rows], '%d-%m-%y')))
+    perkara_values = grid.column(located_tx_cols["PERKARA"]["col"], data_start_row_num) if "PERKARA" in located_tx_cols else None
+
+    # Keep a row if TARIKH or PERKARA is present
+    kept_rows = [
+        i for i in possible_data_rows
+        if tarikh_converted[i] or (perkara_values is not None and i < len(perkara_values) and perkara_values[i])
+    ]
+
+    # Only now build the per-row records
+    for i in kept_rows:
         transaction_item = {}
-        has_essential_data = False
-        for output_key, header_text in TRANSACTION_HEADERS_MAP.items(): # Use original map to iterate desired fields
-            col_info = located_tx_cols.get(output_key)
-            if col_info:
-                value = raw_data.get(col_info["key"], {}).get(r_idx_str)
-                if output_key == "TARIKH": # Transaction TARIKH format DD-MM-YY
-                     transaction_item[output_key] = convert_excel_timestamp(value, '%d-%m-%y')
-                     if transaction_item[output_key]: has_essential_data = True
-                else:
-                    transaction_item[output_key] = value
-            # else:
-                # print(f"[DEBUG TX] Column info for header '{output_key}' not found for row '{r_idx_str}'.")
-
-        # Add ADDITIONAL_DATA if their columns were mapped
-        for add_key in ["ADDITIONAL_DATA_1", "ADDITIONAL_DATA_2", "ADDITIONAL_DATA_3"]:
-            col_info = located_tx_cols.get(add_key)
-            if col_info:
-                value = raw_data.get(col_info["key"], {}).get(r_idx_str)
-                if value is not None: # Only add if value exists
-                    transaction_item[add_key] = value
-        
-        cleaned_transaction_item = {k: v for k, v in transaction_item.items() if v is not None}
-        
-        if has_essential_data or cleaned_transaction_item.get("PERKARA"): # Add if TARIKH or PERKARA is present
-            transactions.append(cleaned_transaction_item)
-            # print(f"[DEBUG TX] Added transaction for row index '{r_idx_str}': {cleaned_transaction_item}")
-        # else:
-            # print(f"[DEBUG TX] Skipped transaction for row index '{r_idx_str}' due to missing essential data: {cleaned_transaction_item}")
-
-
+        for output_key, values in tx_field_values:
+            value = tarikh_converted[i] if output_key == "TARIKH" else (values[i] if i < len(values) else None)
+            if value is not None:
+                transaction_item[output_key] = value
+        for add_key, values in additional_values:
+            value = values[i] if i < len(values) else None
+            if value is not None: # Only add if value exists
+                transaction_item[add_key] = value
+        transactions.append(transaction_item)
+
+    STATS.count("cells_scanned", len(tarikh_values) + sum(len(values) for _, values in tx_field_values)
+                + sum(len(values) for _, values in additional_values))
+    STATS.count("rows_emitted", len(transactions))
+    STATS.count("rows_skipped", len(tarikh_values) - len(transactions))
     return transactions
 
 
-def format_dynamically(raw_data):
+def format_dynamically(raw_data, profile=None):
+    # raw_data: a SheetGrid, or the legacy pandas-style {"Unnamed: N": {"row": value}} dict
+    # profile: the LayoutProfile of the statements (default: the standard layout)
     statement = {}
-    koperasi_col_obj = raw_data.get(KOPERASI_KEY, {})
+    profile = profile or DEFAULT_LAYOUT_PROFILE
+    grid = raw_data if isinstance(raw_data, SheetGrid) else SheetGrid.from_raw_data(raw_data)
+    koperasi_col = grid.column_index(profile.koperasi_key)
 
-    if not koperasi_col_obj:
-        print(f"[ERROR] Main Koperasi header column ('{KOPERASI_KEY}') not found in input JSON. Cannot proceed.")
+    if koperasi_col is None or all(value is None for value in grid.column(koperasi_col)):
+        logger.error("Main Koperasi header column ('%s') not found in input JSON. Cannot proceed.", profile.koperasi_key)
+        STATS.count("no_koperasi_column")
         return {}
 
+    layout = profile.sheet_layout(grid, koperasi_col)
     # 1. Member and Raw Nominee Details
-    member_data, raw_nominee_data = find_member_data(raw_data, koperasi_col_obj)
+    member_data, raw_nominee_data = find_member_data(grid, koperasi_col, layout)
     statement.update(member_data)
 
     # 2. Parse and Add Nominee Object
@@ -302,7 +624,7 @@ def format_dynamically(raw_data):
         statement["NOMINEE"] = None
         
     # 3. Transactions
-    transactions = find_transaction_columns_and_parse(raw_data, koperasi_col_obj)
+    transactions = find_transaction_columns_and_parse(grid, koperasi_col, layout)
     statement["TRANSACTIONS"] = transactions
     
     return statement
@@ -314,8 +636,16 @@ def main():
     parser.add_argument("input_file", help="Path to the input JSON file (pandas-like structure).")
     parser.add_argument("-o", "--output_file", required=True, help="Path to save the formatted JSON output.")
     parser.add_argument("-i", "--indent", type=int, default=2, help="Indentation for output JSON (default: 2).")
+    parser.add_argument("--layout", default="standard", metavar="NAME|FILE", help=f"Statement layout profile: one of {', '.join(LAYOUT_PROFILES)} (default: standard) or a JSON file of LayoutProfile settings.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show debug output of the column and row detection.")
 
     args = parser.parse_args()
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING)
+    try:
+        profile = get_layout_profile(args.layout)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return
 
     try:
         with open(args.input_file, 'r', encoding='utf-8') as f:
@@ -330,7 +660,7 @@ def main():
         print(f"An unexpected error occurred while reading input: {e}")
         return
 
-    formatted_data = format_dynamically(raw_json_data)
+    formatted_data = format_dynamically(raw_json_data, profile)
 
     if not formatted_data or not formatted_data.get("NO. ANGGOTA"):
         print("Error: Failed to extract sufficient data to produce a formatted statement. Output might be empty or incomplete.")
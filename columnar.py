@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from cformat import ADDITIONAL_DATA_KEYS, DEFAULT_LAYOUT_PROFILE, LAYOUT_PROFILES, get_layout_profile
+from instrument import STATS
+
+# parquet: members.parquet + transactions.parquet, arrow: members.arrow + transactions.arrow (Arrow IPC files)
+COLUMNAR_FORMATS = ("parquet", "arrow")
+DEFAULT_BATCH_ROWS = 65536
+
+# Statement fields holding dates, with the format cformat writes them in
+DATE_FIELDS = {"TARIKH LAHIR": "%d-%b-%y", "TARIKH MASUK": "%d-%b-%y", "TARIKH LULUS ALK": "%d-%b-%y", "TARIKH": "%d-%m-%y"}
+AMOUNT_FIELDS = ("WANG MASUK", "WANG KELUAR", "BAKI SYER", "BAKI BONUS", "BAKI SEMUA")
+INTEGER_FIELDS = ("NO. ANGGOTA", "TAHUN")
+UNIX_EPOCH = datetime(1970, 1, 1)
+MS_PER_DAY = 86400000
+NOMINEE_FIELDS = ("NAME", "RELATIONSHIP", "IC", "PHONE")
+
+
+def member_fields(profile=None):
+    # The member keys statements of a cformat.LayoutProfile (default: the standard one) can have;
+    # the raw nominee fields only feed the NOMINEE object
+    profile = profile or DEFAULT_LAYOUT_PROFILE
+    return tuple(dict.fromkeys(key for key in profile.member_labels.values() if not key.endswith("_RAW")))
+
+
+def transaction_fields(profile=None):
+    # The transaction keys statements of a cformat.LayoutProfile (default: the standard one) can have
+    profile = profile or DEFAULT_LAYOUT_PROFILE
+    keys = list(profile.transaction_headers.values())
+    keys += [key for options in profile.multi_part_headers.values() for key in options.values()]
+    return tuple(dict.fromkeys(keys)) + ADDITIONAL_DATA_KEYS
+
+
+MEMBER_FIELDS = member_fields()
+TRANSACTION_FIELDS = transaction_fields()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The parquet and arrow formats need the pyarrow package (pip install pyarrow).")
+    return pyarrow
+
+
+def _to_date(value, fmt):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if type(value) is int or (isinstance(value, str) and re.fullmatch(r"-?\d+", value)):
+        # Dates cformat doesn't recognise (those before 1970) are left as the sheet's epoch milliseconds
+        milliseconds = int(value)
+        return (UNIX_EPOCH + timedelta(milliseconds=milliseconds)).date() if abs(milliseconds) >= MS_PER_DAY else None
+    try:
+        parsed = datetime.strptime(value, fmt).date()
+    except (TypeError, ValueError):
+        return None
+    # Two-digit years: the latest such year that isn't in the future ("55" is 1955, not 2055)
+    if parsed.year > date.today().year:
+        parsed = parsed.replace(year=parsed.year - 100)
+    return parsed
+
+
+def _to_float(value):
+    return float(value) if type(value) is int or type(value) is float else None
+
+
+def _to_int(value):
+    if type(value) is float and value.is_integer():
+        return int(value)
+    return value if type(value) is int else None
+
+
+def _to_string(value):
+    # Unlabelled columns mix numbers and text; numbers keep their JSON spelling
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _column(pa, field):
+    # (arrow type, converter) of a statement field
+    if field in DATE_FIELDS:
+        fmt = DATE_FIELDS[field]
+        return pa.date32(), lambda value: _to_date(value, fmt)
+    if field in AMOUNT_FIELDS:
+        return pa.float64(), _to_float
+    if field in INTEGER_FIELDS:
+        return pa.int64(), _to_int
+    return pa.string(), _to_string
+
+
+class _TableWriter:
+    # One output table: rows are buffered per column and written out every batch_rows
+
+    def __init__(self, pa, path, output_format, columns, batch_rows):
+        self._pa = pa
+        self.schema = pa.schema([(name, arrow_type) for name, arrow_type, _ in columns])
+        self.converters = [(name, converter) for name, _, converter in columns]
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._buffer = {name: [] for name, _ in self.converters}
+        self._buffered = 0
+        if output_format == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def append(self, record):
+        # record: {column: value as it appears in the statement}
+        for name, converter in self.converters:
+            value = record.get(name)
+            converted = None if value is None else converter(value)
+            if converted is None and value is not None:
+                STATS.count("columnar_values_nulled")
+            self._buffer[name].append(converted)
+        self._buffered += 1
+        if self._buffered >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered:
+            return
+        table = self._pa.Table.from_pydict(self._buffer, schema=self.schema)
+        if isinstance(self._writer, self._pa.parquet.ParquetWriter):
+            self._writer.write_table(table, row_group_size=self._buffered)
+        else:
+            self._writer.write_table(table)
+        self.rows += self._buffered
+        self._buffer = {name: [] for name in self._buffer}
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class ColumnarWriter:
+    """
+    Writes statements as two typed tables in output_dir, for loading into analytics tools
+    without parsing JSON: members (one row per statement, nominee fields flattened into
+    NOMINEE_*) and transactions (one row per transaction, LINE being its position in the
+    statement). Both carry NO. ANGGOTA and the sheet name as keys. Dates are real dates,
+    amounts floats; values that don't fit their column's type are written as null.
+    Rows go out in row groups (record batches for Arrow IPC) of batch_rows as statements come in.
+    The columns are the fields of profile, the cformat.LayoutProfile the statements were formatted with.
+    """
+
+    def __init__(self, output_dir, output_format='parquet', batch_rows=DEFAULT_BATCH_ROWS, profile=None):
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format '{output_format}'. Choose from {COLUMNAR_FORMATS}.")
+        pa = _import_pyarrow()
+        os.makedirs(output_dir, exist_ok=True)
+        keys = [("NO. ANGGOTA", *_column(pa, "NO. ANGGOTA")), ("SHEET", pa.string(), _to_string)]
+        member_columns = keys + [(field, *_column(pa, field)) for field in member_fields(profile) if field != "NO. ANGGOTA"]
+        member_columns += [(f"NOMINEE_{field}", pa.string(), _to_string) for field in NOMINEE_FIELDS]
+        transaction_columns = keys + [("LINE", pa.int32(), _to_int)] + [(field, *_column(pa, field)) for field in transaction_fields(profile)]
+        self.paths = {name: os.path.join(output_dir, f"{name}.{output_format}") for name in ("members", "transactions")}
+        self.members = _TableWriter(pa, self.paths["members"], output_format, member_columns, batch_rows)
+        try:
+            self.transactions = _TableWriter(pa, self.paths["transactions"], output_format, transaction_columns, batch_rows)
+        except Exception:
+            self.members.close()
+            raise
+        self.count = 0
+        self._closed = False
+
+    def write(self, statement, sheet_name=None):
+        keys = {"NO. ANGGOTA": statement.get("NO. ANGGOTA"), "SHEET": sheet_name}
+        member = {**statement, **keys}
+        for field, value in (statement.get("NOMINEE") or {}).items():
+            member[f"NOMINEE_{field}"] = value
+        self.members.append(member)
+        for line, transaction in enumerate(statement.get("TRANSACTIONS") or ()):
+            self.transactions.append({**transaction, "LINE": line, **keys})
+        self.count += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.members.close()
+        finally:
+            self.transactions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a JSON file of statements ({sheet: statement} or [statement, ...]) as members and transactions tables (Parquet or Arrow IPC)."
+    )
+    parser.add_argument("input_file", help="Path to the input JSON file.")
+    parser.add_argument("-o", "--output_dir", required=True, help="Directory to write members.<format> and transactions.<format> to.")
+    parser.add_argument("-f", "--format", choices=COLUMNAR_FORMATS, default="parquet", help="Table format (default: parquet).")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help=f"Rows per row group / record batch (default: {DEFAULT_BATCH_ROWS}).")
+    parser.add_argument("--layout", default="standard", metavar="NAME|FILE", help=f"Layout profile the statements were formatted with, for the table columns: one of {', '.join(LAYOUT_PROFILES)} (default: standard) or a JSON profile file.")
+    args = parser.parse_args()
+
+    try:
+        profile = get_layout_profile(args.layout)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return
+
+    try:
+        with open(args.input_file, 'r', encoding='utf-8') as f:
+            statements = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Input file '{args.input_file}' not found.")
+        return
+    except json.JSONDecodeError as e:
+        print(f"Error: Could not decode JSON from '{args.input_file}'. Invalid JSON: {e}")
+        return
+
+    items = statements.items() if isinstance(statements, dict) else enumerate(statements)
+    try:
+        with ColumnarWriter(args.output_dir, args.format, args.batch_rows, profile) as writer:
+            for sheet_name, statement in items:
+                writer.write(statement, str(sheet_name))
+        print(f"Wrote {writer.count} members ({writer.transactions.rows} transactions) to '{args.output_dir}'")
+    except (ImportError, ValueError, OSError) as e:
+        print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import json
+import argparse
+
+# object: {"<sheet>": statement, ...} (the --combined layout), array: [statement, ...],
+# ndjson: one compact statement per line
+OUTPUT_FORMATS = ("object", "array", "ndjson")
+ENCODERS = ("json", "orjson", "auto")
+
+
+def get_encoder(name='json', indent=None, chunked=False):
+    """
+    Returns a function turning a statement into a JSON string.
+    'orjson' needs the orjson package and only knows a 2-space indent (other indents are a ValueError);
+    'auto' picks orjson when it is installed and can give the indent, and falls back to the json module.
+    chunked=True returns one giving the JSON in pieces instead, to be written out as they come
+    (json.JSONEncoder.iterencode; orjson always produces the whole string, as a single piece).
+    """
+    if name == 'orjson' and indent not in (None, 2):
+        raise ValueError(f"The 'orjson' encoder can only indent by 2 spaces, not {indent}; use the json or auto encoder for that.")
+    if name == 'orjson' or (name == 'auto' and indent in (None, 2)):
+        try:
+            import orjson
+        except ImportError:
+            if name == 'orjson':
+                raise ImportError("The 'orjson' encoder needs the orjson package (pip install orjson).")
+        else:
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent is not None else 0)
+            if chunked:
+                return lambda obj: (orjson.dumps(obj, option=option).decode('utf-8'),)
+            return lambda obj: orjson.dumps(obj, option=option).decode('utf-8')
+    elif name not in ENCODERS:
+        raise ValueError(f"Unknown encoder '{name}'. Choose from {ENCODERS}.")
+
+    if indent is None:
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    else:
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+    return encoder.iterencode if chunked else encoder.encode
+
+
+def write_statement_file(output_file, statement, indent=4, encoder='json', chunked=False):
+    # One statement per file, as main.py has always written them
+    encode = get_encoder(encoder, indent, chunked)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        if chunked:
+            f.writelines(encode(statement))
+        else:
+            f.write(encode(statement))
+
+
+class StatementWriter:
+    """
+    Writes statements to a single file as they are produced, so only one statement is in
+    memory at a time. With the json encoder, the 'object' format is byte-for-byte what
+    json.dump({sheet: statement, ...}, indent=indent, ensure_ascii=False) gives.
+    chunked=True writes each statement out piece by piece as it is encoded (see get_encoder).
+    """
+
+    def __init__(self, output_file, output_format='object', indent=4, encoder='json', chunked=False):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}'. Choose from {OUTPUT_FORMATS}.")
+        self.output_format = output_format
+        # NDJSON needs every statement on one line
+        self.indent = None if output_format == 'ndjson' else indent
+        self.chunked = chunked
+        self._encode = get_encoder(encoder, self.indent, chunked)
+        self._key_encode = json.JSONEncoder(ensure_ascii=False).encode
+        self._file = open(output_file, 'w', encoding='utf-8')
+        self.count = 0
+
+    def _separator(self):
+        # What goes between the opening bracket/previous entry and the next entry
+        first = self.count == 0
+        if self.indent is None:
+            return '' if first else ','
+        return ('\n' if first else ',\n') + ' ' * self.indent
+
+    def write(self, statement, sheet_name=None):
+        if self.chunked:
+            self._write_chunks(statement, sheet_name)
+            self.count += 1
+            return
+        encoded = self._encode(statement)
+        if self.output_format == 'ndjson':
+            self._file.write(encoded + '\n')
+        else:
+            if self.count == 0:
+                self._file.write('{' if self.output_format == 'object' else '[')
+            if self.indent is not None:
+                # Nest the statement one level deeper, as json.dump would inside the outer container
+                encoded = encoded.replace('\n', '\n' + ' ' * self.indent)
+            if self.output_format == 'object':
+                key_separator = ': ' if self.indent is not None else ':'
+                encoded = self._key_encode(str(sheet_name)) + key_separator + encoded
+            self._file.write(self._separator() + encoded)
+        self.count += 1
+
+    def _write_chunks(self, statement, sheet_name):
+        # write() without the statement's whole JSON string; the output is the same
+        chunks = self._encode(statement)
+        if self.output_format == 'ndjson':
+            self._file.writelines(chunks)
+            self._file.write('\n')
+            return
+        if self.count == 0:
+            self._file.write('{' if self.output_format == 'object' else '[')
+        self._file.write(self._separator())
+        if self.output_format == 'object':
+            self._file.write(self._key_encode(str(sheet_name)) + (': ' if self.indent is not None else ':'))
+        if self.indent is not None:
+            nested_newline = '\n' + ' ' * self.indent
+            chunks = (chunk.replace('\n', nested_newline) for chunk in chunks)
+        self._file.writelines(chunks)
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.output_format != 'ndjson':
+            opening, closing = ('{', '}') if self.output_format == 'object' else ('[', ']')
+            if self.count == 0:
+                self._file.write(opening)
+            elif self.indent is not None:
+                self._file.write('\n')
+            self._file.write(closing)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-write a JSON file of statements ({sheet: statement} or [statement, ...]) as NDJSON, a JSON array or a JSON object."
+    )
+    parser.add_argument("input_file", help="Path to the input JSON file.")
+    parser.add_argument("-o", "--output_file", required=True, help="Path to save the output.")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="ndjson", help="Output layout (default: ndjson).")
+    parser.add_argument("-i", "--indent", type=int, help="Indentation for object/array output. Omit for compact output.")
+    parser.add_argument("--encoder", choices=ENCODERS, default="json", help="JSON encoder to use (default: json).")
+    args = parser.parse_args()
+
+    try:
+        with open(args.input_file, 'r', encoding='utf-8') as f:
+            statements = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Input file '{args.input_file}' not found.")
+        return
+    except json.JSONDecodeError as e:
+        print(f"Error: Could not decode JSON from '{args.input_file}'. Invalid JSON: {e}")
+        return
+
+    items = statements.items() if isinstance(statements, dict) else enumerate(statements)
+    try:
+        with StatementWriter(args.output_file, args.format, args.indent, args.encoder) as writer:
+            for sheet_name, statement in items:
+                writer.write(statement, sheet_name)
+        print(f"Wrote {writer.count} statements to '{args.output_file}'")
+    except (ImportError, ValueError) as e:
+        print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import cProfile
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+LOG_FORMAT = "[%(levelname)s %(name)s] %(message)s"
+MB = 1024 * 1024
+
+
+class ConsoleHandler(logging.Handler):
+    # Writes to whatever sys.stdout is when the record is emitted, so the log lines of a sheet end up
+    # in the same place as its other console output (deterministic mode captures and replays both)
+    def emit(self, record):
+        try:
+            sys.stdout.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+def configure_logging(level=logging.WARNING):
+    # Console logging for the command line tools; debug output (-v) is off unless asked for
+    root = logging.getLogger()
+    if not any(isinstance(handler, ConsoleHandler) for handler in root.handlers):
+        handler = ConsoleHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class RunStats:
+    """
+    Wall time per pipeline stage and named counters (cells scanned, rows emitted, fallbacks hit...)
+    for one run. Each process has one (STATS); pool workers hand theirs back with every result
+    via pop() and the parent merge()s them. Safe to update from several threads.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = Counter()
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stage_seconds[stage] += elapsed
+                self.stage_calls[stage] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def reset(self):
+        self._lock = threading.Lock() # a forked worker may have copied the lock while held
+        self.started = time.perf_counter()
+        self.stage_seconds.clear()
+        self.stage_calls.clear()
+        self.counters.clear()
+
+    def pop(self):
+        # Everything recorded since the last pop, as plain data another process can merge
+        with self._lock:
+            snapshot = {
+                "stages": {stage: (seconds, self.stage_calls[stage]) for stage, seconds in self.stage_seconds.items()},
+                "counters": dict(self.counters),
+            }
+            self.stage_seconds.clear()
+            self.stage_calls.clear()
+            self.counters.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        with self._lock:
+            for stage, (seconds, calls) in snapshot["stages"].items():
+                self.stage_seconds[stage] += seconds
+                self.stage_calls[stage] += calls
+            self.counters.update(snapshot["counters"])
+
+    def summary(self, **extra):
+        # JSON-ready summary; stage times from pool workers add up, so they can exceed wall_s
+        summary = {"wall_s": round(time.perf_counter() - self.started, 4)}
+        summary.update(extra)
+        summary["stages"] = {
+            stage: {
+                "total_s": round(seconds, 4),
+                "calls": self.stage_calls[stage],
+                "avg_ms": round(seconds * 1000 / self.stage_calls[stage], 3) if self.stage_calls[stage] else None,
+                "per_s": round(self.stage_calls[stage] / seconds, 2) if seconds else None,
+            }
+            for stage, seconds in self.stage_seconds.items()
+        }
+        summary["counters"] = dict(sorted(self.counters.items()))
+        return summary
+
+    def save(self, path, **extra):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(**extra), f, indent=2)
+
+
+STATS = RunStats()
+
+
+def current_rss():
+    # Resident set size of this process in bytes, from /proc/self/statm (None where there is no /proc)
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_rss():
+    # Highest resident set size of this process so far, in bytes. /proc's high-water mark starts afresh
+    # in a program started by a bigger one, where ru_maxrss would carry over the parent's.
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # kilobytes on Linux, bytes on macOS
+
+
+@contextlib.contextmanager
+def profiled(path=None):
+    # cProfile whatever runs inside (this process only) and save the stats to path for `python -m pstats`
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile saved to '{path}' (inspect with: python -m pstats {path})")
@@ -1,40 +1,601 @@
 import argparse
-import os
+import contextlib
+import gc
+import io
 import json
-from aexcel import excel_to_json
-from bnulls import clean_json_data
-from cformat import format_dynamically
+import logging
+import os
+import queue
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from aexcel import READER_ENGINES, excel_to_json, open_workbook, read_sheet_grid, select_sheet_names, workbook_sheet_names
+from bnulls import clean_sheet_grid
+from cformat import (DEFAULT_LAYOUT_PROFILE, LAYOUT_PROFILES, STATEMENT_READ_PLAN, clear_date_cache, detect_layout_profile,
+                     format_dynamically, get_layout_profile)
+from columnar import COLUMNAR_FORMATS, ColumnarWriter
+from dwrite import ENCODERS, OUTPUT_FORMATS, StatementWriter, get_encoder, write_statement_file
+from instrument import MB, STATS, configure_logging, current_rss, peak_rss, profiled
+from manifest import ConversionManifest, conversion_version, detected_layout_entry, load_detected_layout
+from memberindex import MemberIndex
+from sheetcache import DEFAULT_CACHE_SIZE_MB, SheetCache
+from xlsxzip import sheet_fingerprints
 import re
 
+# Sheets each queue of the --pipeline holds before the stage feeding it has to wait
+DEFAULT_QUEUE_SIZE = 8
+# Sheets handed to each pool worker ahead of time with --workers
+IN_FLIGHT_PER_WORKER = 4
+# RSS the --low-memory mode keeps the process under
+DEFAULT_MEMORY_BUDGET_MB = 1024
+# Sheets --layout auto looks at for a statement to detect the workbook's layout from
+LAYOUT_DETECTION_SHEETS = 10
+
 
-def run_scripts(excel_file, output_file, sheet_name):
-    # Run aexcel.py
-    temp_json_file = 'temp.json'
-    excel_to_json(excel_file, temp_json_file, sheet_name)
+def run_scripts(excel_file, output_file, sheet_name, debug_json_file=None, engine='pandas', indent=4, encoder='json', sheet_cache=None,
+                exact_match=False, read_plan=None, profile=None):
+    # Run aexcel.py, keeping the sheet in memory (debug_json_file optionally dumps it like the old temp.json)
+    with STATS.timer("read"):
+        grid = excel_to_json(excel_file, debug_json_file, sheet_name, return_data=True, engine=engine, as_grid=True, cache=sheet_cache,
+                             exact_match=exact_match, read_plan=read_plan)
+    if grid is None:
+        return
 
     # Run bnulls.py
-    with open(temp_json_file, 'r', encoding='utf-8') as f:
-        json_data = json.load(f)
+    with STATS.timer("clean"):
+        cleaned_data = clean_sheet_grid(grid)
+    with STATS.timer("format"):
+        # Without a profile, the one that fits this sheet (the standard one if none does)
+        formatted_data = format_dynamically(cleaned_data, profile or detect_layout_profile(cleaned_data))
 
-    cleaned_data = clean_json_data(json_data)
-    formatted_data = format_dynamically(cleaned_data)
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(formatted_data, f, indent=4, ensure_ascii=False)
+    try:
+        with STATS.timer("write"):
+            write_statement_file(output_file, formatted_data, indent, encoder)
+    except (ImportError, ValueError) as e:
+        print(f"Error: {e}")
 
-def main():
-    parser = argparse.ArgumentParser(description="Run all scripts and output final JSON.")
-    parser.add_argument("excel_file", help="Path to the Excel file.")
-    parser.add_argument("sheet_name", help="Name of the sheet to convert.")
-    parser.add_argument("output_file", help="Path to save the final JSON output.")
-    args = parser.parse_args()
+def detect_workbook_profile(xls, sheet_names):
+    # (profile, names of the sheets probed): the layout profile of the first of the sheets a built-in
+    # profile recognises (see cformat.detect_layout_profile), read with the statement read plan; the
+    # standard profile when none of the first LAYOUT_DETECTION_SHEETS is a statement
+    probed = []
+    for sheet_name in sheet_names[:LAYOUT_DETECTION_SHEETS]:
+        probed.append(sheet_name)
+        grid = clean_sheet_grid(read_sheet_grid(xls, sheet_name, STATEMENT_READ_PLAN))
+        profile = detect_layout_profile(grid)
+        if profile is not None:
+            return profile, probed
+    return DEFAULT_LAYOUT_PROFILE, probed
+
+def detect_file_profile(excel_file, engine='pandas'):
+    # detect_workbook_profile on a workbook that isn't open: an .xlsx is probed with the xml reader,
+    # other formats with engine
+    try:
+        xls = open_workbook(excel_file, 'xml')
+    except (zipfile.BadZipFile, KeyError):
+        xls = open_workbook(excel_file, engine)
+    try:
+        profile, _ = detect_workbook_profile(xls, workbook_sheet_names(xls))
+    finally:
+        xls.close()
+    return profile
+
+def format_grid(grid, profile=None):
+    with STATS.timer("clean"):
+        cleaned_data = clean_sheet_grid(grid)
+    with STATS.timer("format"):
+        return format_dynamically(cleaned_data, profile)
+
+def convert_sheet(xls, sheet_name, read_plan=None, profile=None):
+    with STATS.timer("read"):
+        grid = read_sheet_grid(xls, sheet_name, read_plan)
+    return format_grid(grid, profile)
+
+def safe_file_name(sheet_name):
+    # Sheet names like "5018(B)" or "5099-MD" are fine, but keep path separators out of file names
+    return re.sub(r'[\\/:*?"<>|]', '_', sheet_name)
+
+def convert_sheet_safely(xls, sheet_name, read_plan=None, profile=None):
+    # Returns (statement, None) or (None, error message); never raises so a batch can carry on
+    return _statement_safely(convert_sheet, xls, sheet_name, read_plan, profile)
+
+def _statement_safely(convert, *args):
+    try:
+        formatted_data = convert(*args)
+        if not formatted_data:
+            raise ValueError("no statement could be extracted")
+        return formatted_data, None
+    except Exception as e:
+        return None, str(e)
+
+# Each pool worker opens the workbook once and keeps it for all the sheets it is handed.
+# init_worker and convert_in_worker are what --workers and server.py run their pools with.
+_worker_xls = None
+_worker_read_plan = None
+_worker_profile = None
+
+def init_worker(excel_file, engine, sheet_cache=None, log_level=None, read_plan=None, profile=None):
+    global _worker_xls, _worker_read_plan, _worker_profile
+    _worker_read_plan = read_plan
+    _worker_profile = profile
+    if log_level is not None:
+        configure_logging(log_level)
+    STATS.reset() # a forked worker starts with a copy of the parent's figures
+    with STATS.timer("open"):
+        _worker_xls = open_workbook(excel_file, engine, sheet_cache)
+
+def convert_in_worker(sheet_name, capture_output=False):
+    # Returns (sheet_name, statement, error, captured console output, this worker's stats since its last result)
+    if not capture_output:
+        formatted_data, error = convert_sheet_safely(_worker_xls, sheet_name, _worker_read_plan, _worker_profile)
+        return sheet_name, formatted_data, error, None, STATS.pop()
+    # Deterministic mode: hold the sheet's console output so the parent can replay it in sheet order
+    captured = io.StringIO()
+    with contextlib.redirect_stdout(captured):
+        formatted_data, error = convert_sheet_safely(_worker_xls, sheet_name, _worker_read_plan, _worker_profile)
+    return sheet_name, formatted_data, error, captured.getvalue(), STATS.pop()
+
+def iter_converted_sheets(excel_file, sheet_names, workers, deterministic=False, engine='pandas', sheet_cache=None, read_plan=None,
+                          profile=None):
+    # Yields (index, sheet_name, statement, error). In deterministic mode results come back
+    # in sheet order with each sheet's output replayed in order, exactly like the serial path;
+    # otherwise they are yielded as soon as any worker finishes one. Worker stats are merged into STATS.
+    initargs = (excel_file, engine, sheet_cache, logging.getLogger().getEffectiveLevel(), read_plan, profile)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs) as executor:
+        if deterministic:
+            chunksize = max(1, len(sheet_names) // (workers * 4))
+            results = executor.map(convert_in_worker, sheet_names, [True] * len(sheet_names), chunksize=chunksize)
+            for index, (sheet_name, formatted_data, error, output, stats) in enumerate(results):
+                print(output, end='')
+                STATS.merge(stats)
+                yield index, sheet_name, formatted_data, error
+        else:
+            # Only a few sheets per worker are in flight, and a finished one is let go as soon as it is
+            # yielded, so the parent never holds more than that many statements
+            pending_sheets = iter(enumerate(sheet_names))
+            futures = {}
+            for index, sheet_name in islice(pending_sheets, workers * IN_FLIGHT_PER_WORKER):
+                futures[executor.submit(convert_in_worker, sheet_name)] = index
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    sheet_name, formatted_data, error, _, stats = future.result()
+                    STATS.merge(stats)
+                    for next_index, next_sheet_name in islice(pending_sheets, 1):
+                        futures[executor.submit(convert_in_worker, next_sheet_name)] = next_index
+                    yield index, sheet_name, formatted_data, error
+
+_PIPELINE_DONE = object() # end-of-stream marker passed down the pipeline queues
+
+def iter_pipelined_sheets(xls, sheet_names, formatters=1, queue_size=DEFAULT_QUEUE_SIZE, read_plan=None, profile=None):
+    """
+    Yields (index, sheet_name, statement, error) like iter_converted_sheets, from a staged pipeline
+    in this process: a reader thread parses the sheets of xls into a bounded queue, `formatters`
+    threads clean and format them into a second bounded queue, and the caller draining the
+    generator is the write stage. A full queue holds up the stage feeding it, so only about
+    2 * queue_size sheets are in flight and the run is paced by its slowest stage.
+    Stages overlap where they release the GIL (inflating the zip, file I/O); spreading CPU-bound
+    work over cores is what --workers does. Time a stage spends waiting on a queue is recorded
+    in STATS as <stage>_wait; results come in completion order.
+    """
+    sheets = queue.Queue(maxsize=queue_size)
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event() # the consumer went away; stages drop what they hold and exit
+
+    def put(q, item, wait_stage):
+        with STATS.timer(wait_stage):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+        return False
+
+    def get(q, wait_stage):
+        with STATS.timer(wait_stage):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        return _PIPELINE_DONE
+
+    def read_sheets():
+        try:
+            for index, sheet_name in enumerate(sheet_names):
+                try:
+                    with STATS.timer("read"):
+                        item = (index, sheet_name, read_sheet_grid(xls, sheet_name, read_plan), None)
+                except Exception as e:
+                    item = (index, sheet_name, None, str(e))
+                if not put(sheets, item, "read_wait"):
+                    return
+        finally:
+            for _ in range(formatters):
+                put(sheets, _PIPELINE_DONE, "read_wait")
+
+    def format_sheets():
+        try:
+            while True:
+                item = get(sheets, "format_wait")
+                if item is _PIPELINE_DONE:
+                    return
+                index, sheet_name, grid, error = item
+                formatted_data = None
+                if error is None:
+                    formatted_data, error = _statement_safely(format_grid, grid, profile)
+                if not put(results, (index, sheet_name, formatted_data, error), "format_wait"):
+                    return
+        finally:
+            put(results, _PIPELINE_DONE, "format_wait")
+
+    threads = [threading.Thread(target=read_sheets, name="pipeline-read", daemon=True)]
+    threads += [threading.Thread(target=format_sheets, name=f"pipeline-format-{n}", daemon=True) for n in range(formatters)]
+    for thread in threads:
+        thread.start()
+    try:
+        running = formatters
+        while running:
+            item = get(results, "write_wait")
+            if item is _PIPELINE_DONE:
+                running -= 1
+                continue
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+def iter_low_memory_sheets(xls, sheet_names, memory_budget, read_plan=None, profile=None):
+    """
+    Yields (index, sheet_name, statement, error) like the serial path, converting one sheet at a time
+    and letting go of it once the caller has written it. After every sheet the process RSS is held
+    against memory_budget (bytes): over it, the formatter's caches are dropped and the garbage
+    collected, and if that doesn't bring it back under, MemoryError stops the batch.
+    """
+    profile = profile or DEFAULT_LAYOUT_PROFILE
+    for index, sheet_name in enumerate(sheet_names):
+        formatted_data, error = convert_sheet_safely(xls, sheet_name, read_plan, profile)
+        yield index, sheet_name, formatted_data, error
+        del formatted_data
+        rss = current_rss() or peak_rss()
+        if rss is None or rss <= memory_budget:
+            continue
+        STATS.count("memory_budget_collections")
+        clear_date_cache()
+        profile.clear_layouts()
+        gc.collect()
+        rss = current_rss() or peak_rss()
+        if rss > memory_budget:
+            raise MemoryError(f"The process uses {rss // MB} MB after sheet '{sheet_name}', over the memory budget of {memory_budget // MB} MB.")
+
+def print_pipeline_stats():
+    # Throughput of each --pipeline stage and how long it sat waiting on its queues
+    summary = STATS.summary()["stages"]
+    parts = []
+    for stage in ("read", "format", "write"):
+        busy = summary.get(stage, {})
+        waited = summary.get(f"{stage}_wait", {}).get("total_s", 0.0)
+        parts.append(f"{stage} {busy.get('calls', 0)} sheets in {busy.get('total_s', 0.0):.2f}s "
+                     f"({busy.get('per_s') or 0:.1f}/s, waited {waited:.2f}s)")
+    print("Pipeline: " + "; ".join(parts) + ".")
+
+def write_ready_statements(writer, pending, next_index):
+    # Write pending[next_index], pending[next_index + 1], ... for as long as they are available and
+    # return the first index still missing. Entries are None (failed sheet),
+    # ('converted', sheet_name, statement) or ('cached', sheet_name, statement file).
+    while next_index in pending:
+        ready = pending.pop(next_index)
+        next_index += 1
+        if ready is None:
+            continue
+        source, sheet_name, statement = ready
+        with STATS.timer("write"):
+            if source == 'cached':
+                with open(statement, 'r', encoding='utf-8') as f:
+                    statement = json.load(f)
+            writer.write(statement, sheet_name)
+    return next_index
+
+def run_batch(excel_file, output_path, sheet_filter=None, combined=False, workers=1, deterministic=False, engine='pandas',
+              output_format=None, indent=4, encoder='json', incremental=False, cache_dir=None, sheet_cache=None, read_plan=None,
+              pipeline=False, queue_size=DEFAULT_QUEUE_SIZE, profile=None, memory_budget=None):
+    # Open the workbook once and convert every matching sheet, optionally on a pool of worker processes.
+    # Writes <output_path>/<sheet>.json per sheet, or streams every statement into the single file
+    # output_path when combined (or an output_format is given): a {sheet: statement} object by default.
+    # The parquet/arrow formats write members and transactions tables into the directory output_path.
+    # With incremental=True only sheets whose content changed since the last run are converted; the
+    # rest are reused from cache_dir (default: the output directory, or <output_path>.cache when combined).
+    # sheet_cache (a SheetCache) keeps parsed sheets across runs, so re-running on an unchanged
+    # workbook skips the .xlsx parsing. read_plan (a sheetgrid.ReadPlan) limits what is read of each sheet.
+    # profile (a cformat.LayoutProfile) is the layout of the statements; when None it is detected once from
+    # the first statement sheet (see detect_workbook_profile) and used for the whole workbook.
+    # pipeline=True overlaps reading, formatting and writing (see iter_pipelined_sheets); workers
+    # is then the number of formatter threads.
+    # memory_budget (bytes) turns on the low-memory mode: sheets are converted one at a time (no pool or
+    # pipeline) with a read plan, statements are encoded straight into the output and the batch stops
+    # when the process RSS can't be kept under the budget (see iter_low_memory_sheets).
+    # Returns a list of (sheet_name, error message) for the sheets that failed.
+    combined = combined or output_format is not None
+    chunked = memory_budget is not None
+    if memory_budget is not None:
+        if workers > 1 or pipeline:
+            print("Warning: The low-memory mode converts one sheet at a time; ignoring --workers and --pipeline.")
+            workers, pipeline = 1, False
+        if read_plan is None and engine != 'pandas':
+            read_plan = (profile or DEFAULT_LAYOUT_PROFILE).read_plan
+    xls = None
+    fingerprints = {}
+    try:
+        if incremental:
+            # Sheet names come from the zip too, so an unchanged workbook is never parsed
+            fingerprints = sheet_fingerprints(excel_file)
+            all_sheet_names = list(fingerprints)
+        else:
+            with STATS.timer("open"):
+                xls = open_workbook(excel_file, engine, sheet_cache)
+                all_sheet_names = workbook_sheet_names(xls)
+    except FileNotFoundError:
+        print(f"Error: File '{excel_file}' not found.")
+        return None
+    except (zipfile.BadZipFile, KeyError) as e:
+        print(f"Error: {'Incremental mode' if incremental else 'The xml reader'} needs an .xlsx workbook; could not read '{excel_file}': {e}")
+        return None
+
+    sheet_names = select_sheet_names(all_sheet_names, sheet_filter)
+    if not sheet_names:
+        print(f"Error: No worksheet matching '{sheet_filter}' found in '{excel_file}'. Available sheets: {all_sheet_names}")
+        return None
+    if incremental:
+        # Per-sheet output files are the cached statements; a combined file keeps its own cache directory
+        cache_dir = cache_dir or (output_path + '.cache' if combined else output_path)
+    detected_layout = None
+    if profile is None:
+        # An unchanged workbook isn't opened again: incremental runs reuse the profile detected last time
+        if incremental:
+            profile = LAYOUT_PROFILES.get(load_detected_layout(cache_dir, sheet_names, fingerprints))
+        if profile is None:
+            # The workbook isn't open yet in incremental mode; its .xlsx is probed with the xml reader
+            probe_xls = xls or open_workbook(excel_file, 'xml')
+            try:
+                with STATS.timer("detect_layout"):
+                    profile, probed = detect_workbook_profile(probe_xls, sheet_names)
+            finally:
+                if xls is None:
+                    probe_xls.close()
+            if incremental:
+                detected_layout = detected_layout_entry(profile.name, {name: fingerprints[name] for name in probed})
+        print(f"Layout: {profile.name} (detected from the workbook's first statement sheet).")
+
+    writer = None
+    manifest = None
+    try:
+        if output_format in COLUMNAR_FORMATS:
+            writer = ColumnarWriter(output_path, output_format, profile=profile)
+        elif combined:
+            writer = StatementWriter(output_path, output_format or 'object', indent, encoder, chunked)
+        else:
+            get_encoder(encoder, indent) # an encoder that can't give the output fails before any sheet is converted
+            os.makedirs(output_path, exist_ok=True)
+        if incremental:
+            layout = profile.to_dict()
+            version = conversion_version(engine, layout) if combined else conversion_version(engine, layout, indent, encoder)
+            os.makedirs(cache_dir, exist_ok=True)
+            manifest = ConversionManifest(cache_dir, version)
+            if detected_layout is not None:
+                manifest.detected_layout = detected_layout
+            for stale_sheet_name in [name for name in manifest.sheets if name not in fingerprints]:
+                manifest.forget(stale_sheet_name)
+    except (ImportError, ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return None
+
+    # Sheets to reuse from the cache (by position in sheet_names) and the ones to convert
+    reused = {}
+    if manifest is not None:
+        for index, sheet_name in enumerate(sheet_names):
+            cached_result = manifest.cached_result(sheet_name, fingerprints[sheet_name])
+            if cached_result is not None:
+                reused[index] = cached_result
+    to_convert = [index for index in range(len(sheet_names)) if index not in reused]
+    names_to_convert = [sheet_names[index] for index in to_convert]
+
+    if not names_to_convert:
+        results = iter(())
+    elif memory_budget is not None:
+        if xls is None:
+            with STATS.timer("open"):
+                xls = open_workbook(excel_file, engine, sheet_cache)
+        results = iter_low_memory_sheets(xls, names_to_convert, memory_budget, read_plan, profile)
+    elif pipeline:
+        if xls is None:
+            with STATS.timer("open"):
+                xls = open_workbook(excel_file, engine, sheet_cache)
+        results = iter_pipelined_sheets(xls, names_to_convert, max(1, workers), queue_size, read_plan, profile)
+    elif workers > 1:
+        if xls is not None:
+            xls.close() # workers open their own copy
+            xls = None
+        results = iter_converted_sheets(excel_file, names_to_convert, workers, deterministic, engine, sheet_cache, read_plan, profile)
+    else:
+        if xls is None:
+            with STATS.timer("open"):
+                xls = open_workbook(excel_file, engine, sheet_cache)
+        results = ((index, sheet_name) + convert_sheet_safely(xls, sheet_name, read_plan, profile) for index, sheet_name in enumerate(names_to_convert))
+
+    # Results may arrive out of order from the pool; the combined file always follows sheet order,
+    # so early arrivals wait here until every sheet before them has been written.
+    # Reused sheets are read back from the cache only when their turn comes.
+    pending = {}
+    failures = []
+    for index, (kind, detail) in reused.items():
+        if kind == 'error':
+            print(f"Error: Sheet '{sheet_names[index]}' failed: {detail} (unchanged since the last run)")
+            failures.append((index, sheet_names[index], detail))
+            pending[index] = None
+        else:
+            pending[index] = ('cached', sheet_names[index], detail)
+    next_index = 0
+    try:
+        for work_index, sheet_name, formatted_data, error in results:
+            index = to_convert[work_index]
+            if error is not None:
+                print(f"Error: Sheet '{sheet_name}' failed: {error}")
+                failures.append((index, sheet_name, error))
+                if manifest is not None:
+                    manifest.record(sheet_name, fingerprints[sheet_name], error=error)
+                if not combined:
+                    # Don't leave the statement an earlier run wrote next to the failure
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(os.path.join(output_path, f"{safe_file_name(sheet_name)}.json"))
+            else:
+                file_name = f"{safe_file_name(sheet_name)}.json"
+                if not combined:
+                    statement_file = os.path.join(output_path, file_name)
+                    with STATS.timer("write"):
+                        write_statement_file(statement_file, formatted_data, indent, encoder, chunked)
+                elif manifest is not None:
+                    statement_file = os.path.join(manifest.cache_dir, file_name)
+                    with STATS.timer("write"):
+                        write_statement_file(statement_file, formatted_data, None, chunked=chunked)
+                if manifest is not None:
+                    manifest.record(sheet_name, fingerprints[sheet_name], os.path.relpath(statement_file, manifest.cache_dir))
+            if combined:
+                pending[index] = ('converted', sheet_name, formatted_data) if error is None else None
+                next_index = write_ready_statements(writer, pending, next_index)
+            formatted_data = None # let go of the statement before the next sheet is read
+        if combined:
+            write_ready_statements(writer, pending, next_index)
+    except MemoryError as e:
+        # Only the low-memory mode raises it between sheets; what was converted so far is kept
+        print(f"Error: {e} Stopping the batch.")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+        if xls is not None:
+            xls.close()
+        if manifest is not None:
+            manifest.save()
+
+    failures = [(sheet_name, error) for _, sheet_name, error in sorted(failures)]
+    print(f"Converted {len(sheet_names) - len(failures)} of {len(sheet_names)} sheets from '{excel_file}'"
+          + (f" ({len(reused)} unchanged, reused from cache)." if incremental else "."))
+    if memory_budget is not None:
+        peak = peak_rss()
+        if peak is not None:
+            print(f"Peak RSS: {peak / MB:.0f} MB (budget: {memory_budget // MB} MB).")
+    if pipeline and names_to_convert:
+        print_pipeline_stats()
+    if sheet_cache is not None and (workers <= 1 or pipeline):
+        print(f"Sheet cache: {sheet_cache.hits} parsed sheets reused, {sheet_cache.misses} parsed.")
+    for sheet_name, error in failures:
+        print(f"  FAILED {sheet_name}: {error}")
+    return failures
+
+def convert_from_args(args):
+    indent = None if args.compact else 4
+    sheet_cache = SheetCache(args.sheet_cache, args.sheet_cache_size * 1024 * 1024) if args.sheet_cache else None
+    try:
+        # None: detected from the workbook (see run_batch) or the sheet (see run_scripts)
+        profile = None if args.layout == 'auto' else get_layout_profile(args.layout)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    # The low-memory mode and read plans use the xml reader unless told otherwise: pandas can't read part of a sheet
+    engine = args.reader or ('xml' if args.low_memory or args.read_plan else 'pandas')
+    if args.read_plan and engine == 'pandas':
+        print("Warning: --read-plan has no effect with --reader pandas, which always reads whole sheets; use --reader openpyxl or xml.")
+    # The built-in profiles all read the same cells, so a detected one can use the standard plan
+    read_plan = (profile or DEFAULT_LAYOUT_PROFILE).read_plan if args.read_plan or (args.low_memory and engine != 'pandas') else None
+
+    if args.batch:
+        sheet_filter = None if args.sheet_name == '*' else args.sheet_name
+        memory_budget = args.memory_budget * MB if args.low_memory else None
+        failures = run_batch(args.excel_file, args.output_file, sheet_filter=sheet_filter, combined=args.combined, workers=args.workers,
+                             deterministic=args.deterministic, engine=engine, output_format=args.format, indent=indent,
+                             encoder=args.encoder, incremental=args.incremental, cache_dir=args.cache_dir, sheet_cache=sheet_cache,
+                             read_plan=read_plan, pipeline=args.pipeline, queue_size=args.queue_size, profile=profile,
+                             memory_budget=memory_budget)
+        if failures is None or failures:
+            raise SystemExit(1)
+        return
+
+    # The single statement file is written last; an encoder that can't give it fails before the sheet is read
+    try:
+        get_encoder(args.encoder, indent)
+    except (ImportError, ValueError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+
+    if args.index or args.ic:
+        try:
+            index = MemberIndex.load(args.excel_file, profile=profile, engine=engine)
+        except FileNotFoundError:
+            print(f"Error: File '{args.excel_file}' not found.")
+            raise SystemExit(1)
+        except Exception as e:
+            print(f"Error: Could not build the member index of '{args.excel_file}': {e}")
+            raise SystemExit(1)
+        sheet_name = index.find_by_ic(args.sheet_name) if args.ic else index.find_sheet(args.sheet_name)
+        if sheet_name is None:
+            print(f"Error: No sheet found for {'IC number' if args.ic else 'member'} '{args.sheet_name}' in '{args.excel_file}'.")
+            raise SystemExit(1)
+        run_scripts(args.excel_file, args.output_file, sheet_name, args.debug_json, engine, indent, args.encoder, sheet_cache,
+                    exact_match=True, read_plan=read_plan, profile=profile)
+        return
 
     # Extract leading numeric part from sheet_name
     match = re.match(r"^\d+", args.sheet_name)
     processed_sheet_name = match.group(0) if match else args.sheet_name
 
-    run_scripts(args.excel_file, args.output_file, processed_sheet_name)
+    run_scripts(args.excel_file, args.output_file, processed_sheet_name, args.debug_json, engine, indent, args.encoder, sheet_cache,
+                read_plan=read_plan, profile=profile)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all scripts and output final JSON.")
+    parser.add_argument("excel_file", help="Path to the Excel file.")
+    parser.add_argument("sheet_name", help="Name of the sheet to convert. In batch mode, a sheet name prefix or glob ('*' for all sheets).")
+    parser.add_argument("output_file", help="Path to save the final JSON output. In batch mode, the output directory (one file per sheet) unless --combined is given.")
+    parser.add_argument("-b", "--batch", action="store_true", help="Convert every sheet matching sheet_name, opening the workbook only once.")
+    parser.add_argument("--combined", action="store_true", help="In batch mode, write all statements to output_file as one JSON object keyed by sheet name.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="In batch mode, convert sheets on N worker processes (default: 1, no pool).")
+    parser.add_argument("--pipeline", action="store_true", help="In batch mode, read, format and write sheets in overlapping stages linked by bounded queues; --workers then sets the number of formatter threads.")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help=f"With --pipeline, how many sheets each stage may queue up before the one feeding it waits (default: {DEFAULT_QUEUE_SIZE}).")
+    parser.add_argument("--deterministic", action="store_true", help="With --workers, gather results and console output in sheet order so the run is byte-identical to the serial one.")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS + COLUMNAR_FORMATS, help="In batch mode, stream all statements into output_file as a {sheet: statement} object, a JSON array or NDJSON (implies --combined); parquet/arrow write typed members and transactions tables into the output_file directory instead.")
+    parser.add_argument("--compact", action="store_true", help="Write JSON without indentation.")
+    parser.add_argument("--encoder", choices=ENCODERS, default="json", help="JSON encoder: json (default), orjson (only with --compact, it can't indent by 4 spaces), or auto (orjson when installed and the output is --compact).")
+    parser.add_argument("--incremental", action="store_true", help="In batch mode, only convert sheets whose content changed since the last run and reuse the cached statements for the rest.")
+    parser.add_argument("--cache-dir", help="Where --incremental keeps its manifest (default: the output directory, or <output_file>.cache when combined).")
+    parser.add_argument("--sheet-cache", metavar="DIR", help="Keep parsed sheets in DIR and reuse them while the workbook is unchanged (same path, size and modification time).")
+    parser.add_argument("--sheet-cache-size", type=int, default=DEFAULT_CACHE_SIZE_MB, metavar="MB", help=f"Size limit of --sheet-cache; least recently used sheets are evicted (default: {DEFAULT_CACHE_SIZE_MB}).")
+    parser.add_argument("--index", action="store_true", help="Look sheet_name up exactly as a member number (NO. ANGGOTA), sheet number or sheet name in the workbook's member index (built on first use).")
+    parser.add_argument("--ic", action="store_true", help="Treat sheet_name as an IC number (NO. K/P) and look it up in the member index.")
+    parser.add_argument("--reader", choices=READER_ENGINES, help="Sheet reader: pd.read_excel (default), streaming read-only openpyxl, or xml (a value-only parser streaming the sheet XML straight out of the .xlsx; the default with --low-memory or --read-plan).")
+    parser.add_argument("--read-plan", action="store_true", help="With --reader openpyxl or xml (the default then), only load the cells the statement uses: the member and header rows, then just the transaction columns (sheets without the Koperasi layout stop there). --debug-json then dumps only those cells.")
+    parser.add_argument("--layout", default="auto", metavar="NAME|FILE", help=f"Statement layout profile: auto, one of {', '.join(LAYOUT_PROFILES)} or a JSON file of cformat.LayoutProfile settings. auto (the default) picks the built-in profile that fits the workbook's first statement sheet and uses it for every sheet; give a profile to skip the detection. Sheets of the same shape reuse the cell layout found on the first one.")
+    parser.add_argument("--low-memory", action="store_true", help="Keep memory use down on very large workbooks: convert one sheet at a time with a read plan (the xml reader unless --reader says otherwise), release each sheet once it is written and encode statements straight into the output. In batch mode, stops when the process can't be kept under --memory-budget.")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET_MB, metavar="MB", help=f"RSS limit of --low-memory in batch mode (default: {DEFAULT_MEMORY_BUDGET_MB}).")
+    parser.add_argument("--debug-json", metavar="FILE", help="Also dump the raw sheet JSON (the old temp.json) to FILE. Single-sheet mode only.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show debug output of the column and row detection.")
+    parser.add_argument("--stats", metavar="FILE", help="Save per-stage timings and counters (cells scanned, rows emitted, fallbacks hit) of the run as JSON to FILE.")
+    parser.add_argument("--profile", metavar="FILE", help="Run under cProfile and save the stats to FILE (the main process only, not --workers).")
+    args = parser.parse_args()
+
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING)
+    try:
+        with profiled(args.profile):
+            convert_from_args(args)
+    finally:
+        if args.stats:
+            peak = peak_rss()
+            STATS.save(args.stats, excel_file=args.excel_file, sheet_name=args.sheet_name, batch=args.batch, workers=args.workers,
+                       peak_rss_mb=round(peak / MB, 1) if peak is not None else None)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+
+import aexcel
+import bnulls
+import cformat
+import dwrite
+import sheetgrid
+import xlsxzip
+
+# Bump when the manifest layout itself changes
+MANIFEST_VERSION = 1
+MANIFEST_FILE = "xlsx2json-manifest.json"
+
+
+def conversion_version(*settings):
+    """
+    Hash of everything other than the sheet content that decides what a statement looks like:
+    the converter and writer modules' source, cformat's mapping constants (as they are at run time) and
+    any output settings passed in. Cached statements from a different version are not reused.
+    """
+    digest = hashlib.sha256(str(MANIFEST_VERSION).encode("ascii"))
+    for module in (aexcel, bnulls, cformat, dwrite, sheetgrid, xlsxzip):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    mapping_constants = [
+        cformat.KOPERASI_KEY, cformat.MEMBER_LABELS_MAP, cformat.MEMBER_LABELS_EXPECTED_ROW_INDICES,
+        cformat.PREFERRED_MEMBER_VALUE_COLS, cformat.MEMBER_VALUE_ROW_OFFSETS, cformat.ROW_ABOVE_VALUE_LABELS,
+        cformat.ROW_ABOVE_VALUE_COL, cformat.TRANSACTION_HEADERS_MAP,
+        cformat.MULTI_PART_TX_HEADERS, cformat.TX_HEADER_TYPICAL_ROW_INDICES,
+    ]
+    digest.update(json.dumps(mapping_constants, sort_keys=True).encode("utf-8"))
+    digest.update(repr(settings).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def detected_layout_entry(profile_name, probed_fingerprints):
+    # What ConversionManifest.detected_layout keeps: the layout profile detected from the sheets
+    # probed for it ({sheet name: fingerprint}, in workbook order)
+    return {"profile": profile_name, "sheets": probed_fingerprints, "version": conversion_version()}
+
+
+def load_detected_layout(cache_dir, sheet_names, fingerprints):
+    # The name of the layout profile an earlier run detected, if the sheets it probed are still the
+    # first of sheet_names, unchanged, and the converter is the same; otherwise None
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            detected = json.load(f).get("detected_layout") or {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    probed = detected.get("sheets") or {}
+    if not probed or list(probed) != list(sheet_names[:len(probed)]):
+        return None
+    if any(fingerprints.get(name) != fingerprint for name, fingerprint in probed.items()):
+        return None
+    return detected.get("profile") if detected.get("version") == conversion_version() else None
+
+
+class ConversionManifest:
+    """
+    Per-sheet content fingerprints of the statements in cache_dir, saved as
+    cache_dir/xlsx2json-manifest.json. A statement file is reused as long as its sheet's
+    fingerprint and the conversion version both still match.
+    """
+
+    def __init__(self, cache_dir, version):
+        # Errors are recorded too: an unchanged sheet that failed to convert fails the same way again
+        self.cache_dir = cache_dir
+        self.version = version
+        self.path = os.path.join(cache_dir, MANIFEST_FILE)
+        self.sheets = {}
+        # The layout --layout auto detected (see detected_layout_entry), kept whatever the version
+        self.detected_layout = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self.detected_layout = stored.get("detected_layout")
+        if stored.get("version") == version:
+            self.sheets = stored.get("sheets", {})
+
+    def cached_result(self, sheet_name, fingerprint):
+        # ("file", path of the reusable statement) or ("error", message) if the unchanged sheet
+        # failed last time, or None if the sheet has to be converted again
+        entry = self.sheets.get(sheet_name)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        if entry.get("error") is not None:
+            return "error", entry["error"]
+        path = os.path.join(self.cache_dir, entry["file"])
+        return ("file", path) if os.path.exists(path) else None
+
+    def record(self, sheet_name, fingerprint, file_name=None, error=None):
+        # A sheet either has a statement file (relative to cache_dir) or the error it failed with;
+        # a sheet that fails now loses the statement file it had
+        entry = {"fingerprint": fingerprint}
+        if error is not None:
+            entry["error"] = error
+            self._remove_file(self.sheets.get(sheet_name))
+        else:
+            entry["file"] = file_name
+        self.sheets[sheet_name] = entry
+
+    def forget(self, sheet_name):
+        # Drop a sheet (e.g. deleted from the workbook) along with its statement file
+        self._remove_file(self.sheets.pop(sheet_name, None))
+
+    def _remove_file(self, entry):
+        if entry and entry.get("file"):
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except FileNotFoundError:
+                pass
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run never leaves a half-written manifest
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "detected_layout": self.detected_layout, "sheets": self.sheets},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
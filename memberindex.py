@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import re
+import zipfile
+
+from cformat import DEFAULT_LAYOUT_PROFILE, LAYOUT_PROFILES, detect_layout_profile, find_member_data, get_layout_profile
+from xlsxzip import XlsxReader
+
+# Bump when the index layout or what goes into it changes
+INDEX_VERSION = 2
+
+
+def index_path(excel_file):
+    # The index lives next to the workbook: test2.xlsx -> test2.xlsx.index.json
+    return f"{excel_file}.index.json"
+
+
+def member_key(value):
+    # 5000, 5000.0 and " 5000" are the same member number
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else None
+
+
+def ic_key(value):
+    # IC numbers are compared on their digits only: "860325-59-5170" == "860325595170"
+    digits = re.sub(r"\D", "", str(value)) if value is not None else ""
+    return digits or None
+
+
+def probe_rows(profile=None):
+    # Rows to read for the member details of a profile (of any built-in one when None): up to the
+    # last member label or value row, +1 for the header row and +1 as grid rows are 0-based
+    profiles = [profile] if profile is not None else LAYOUT_PROFILES.values()
+    return max(max(max(row for _, _, row in p.label_cells), *p.member_value_rows) for p in profiles) + 2
+
+
+def layout_key(profile=None):
+    # What the index is built for: a profile's settings, or "auto" when each sheet's profile is detected
+    return profile.plan_key if profile is not None else "auto"
+
+
+def probe_members(excel_file, profile=None, engine='pandas'):
+    """
+    Yields (sheet name, member details) for every sheet of the workbook, reading only the rows the
+    member labels are on (the transactions are never parsed). Details are what cformat would put
+    in the statement with profile (detected per sheet when None); sheets without the Koperasi
+    layout give {}. Workbooks that aren't an .xlsx are read whole with engine.
+    """
+    # Imported here: answering lookups from a saved index shouldn't pay for importing pandas
+    from aexcel import iter_sheet_rows, open_workbook, read_sheet_grid, rows_to_grid, workbook_sheet_names
+
+    try:
+        xls = open_workbook(excel_file, 'xml')
+    except (zipfile.BadZipFile, KeyError):
+        if engine == 'xml':
+            raise
+        xls = open_workbook(excel_file, engine)
+    max_row = probe_rows(profile)
+    try:
+        for sheet_name in workbook_sheet_names(xls):
+            if isinstance(xls, XlsxReader):
+                grid = rows_to_grid(iter_sheet_rows(xls, sheet_name, max_row))
+            else:
+                grid = read_sheet_grid(xls, sheet_name)
+            sheet_profile = profile or detect_layout_profile(grid) or DEFAULT_LAYOUT_PROFILE
+            koperasi_col = grid.column_index(sheet_profile.koperasi_key)
+            if koperasi_col is None:
+                yield sheet_name, {}
+                continue
+            member_details, _ = find_member_data(grid, koperasi_col, sheet_profile.sheet_layout(grid, koperasi_col))
+            yield sheet_name, member_details
+    finally:
+        xls.close()
+
+
+class MemberIndex:
+    """
+    Exact lookups from member number (NO. ANGGOTA), IC number (NO. K/P) or a sheet's leading
+    number to the sheet holding that member's statement. Built once per workbook version by
+    probing each sheet's member rows and saved next to the workbook (see index_path); load()
+    rebuilds it when the workbook's size or modification time no longer match.
+    Where several sheets claim the same number, the first sheet wins.
+    """
+
+    def __init__(self, excel_file, sheets, size=None, mtime_ns=None, layout="auto"):
+        # sheets: {sheet name: {"NO. ANGGOTA": ..., "NO. K/P": ..., "NAMA": ...}} in workbook order
+        # layout: the layout_key of the profile the sheets were probed with
+        self.excel_file = excel_file
+        self.sheets = sheets
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.layout = layout
+        self.members = {}
+        self.ics = {}
+        self.sheet_numbers = {}
+        self.duplicates = []
+        for sheet_name, record in sheets.items():
+            number = re.match(r"^\d+", sheet_name)
+            if number:
+                self.sheet_numbers.setdefault(number.group(0), sheet_name)
+            for table, key in ((self.members, member_key(record.get("NO. ANGGOTA"))), (self.ics, ic_key(record.get("NO. K/P")))):
+                if key is None:
+                    continue
+                if key in table:
+                    self.duplicates.append((key, table[key], sheet_name))
+                else:
+                    table[key] = sheet_name
+
+    @classmethod
+    def build(cls, excel_file, profile=None, engine='pandas'):
+        stat = os.stat(excel_file)
+        sheets = {}
+        for sheet_name, member_details in probe_members(excel_file, profile, engine):
+            sheets[sheet_name] = {label: member_details.get(label) for label in ("NO. ANGGOTA", "NO. K/P", "NAMA")}
+        return cls(excel_file, sheets, stat.st_size, stat.st_mtime_ns, layout_key(profile))
+
+    @classmethod
+    def load(cls, excel_file, rebuild=False, save=True, profile=None, engine='pandas'):
+        # The saved index if it still matches the workbook and profile, otherwise a freshly built (and saved) one
+        stat = os.stat(excel_file)
+        if not rebuild:
+            try:
+                with open(index_path(excel_file), "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                current = (INDEX_VERSION, stat.st_size, stat.st_mtime_ns, layout_key(profile))
+                if (stored.get("version"), stored.get("size"), stored.get("mtime_ns"), stored.get("layout")) == current:
+                    return cls(excel_file, stored["sheets"], stat.st_size, stat.st_mtime_ns, stored["layout"])
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                pass
+        index = cls.build(excel_file, profile, engine)
+        if save:
+            try:
+                index.save()
+            except OSError as e:
+                print(f"Warning: Could not save the member index to '{index_path(excel_file)}': {e}")
+        return index
+
+    def save(self):
+        path = index_path(self.excel_file)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "size": self.size, "mtime_ns": self.mtime_ns, "layout": self.layout, "sheets": self.sheets},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def find_sheet(self, member):
+        # Sheet for a member number, else for a sheet number ("5099" -> "5099-MD"), else an exact sheet name
+        key = member_key(member)
+        return self.members.get(key) or self.sheet_numbers.get(key) or (key if key in self.sheets else None)
+
+    def find_by_ic(self, ic):
+        return self.ics.get(ic_key(ic))
+
+    def record(self, sheet_name):
+        return self.sheets.get(sheet_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the member index of a workbook, or look a member up in it.")
+    parser.add_argument("excel_file", help="Path to the Excel file.")
+    lookup = parser.add_mutually_exclusive_group()
+    lookup.add_argument("-m", "--member", help="Member number (NO. ANGGOTA) or sheet number to look up.")
+    lookup.add_argument("--ic", help="IC number (NO. K/P) to look up, with or without dashes.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if the saved one is up to date.")
+    parser.add_argument("--layout", default="auto", metavar="NAME|FILE", help=f"Statement layout profile to find the member details with: auto (detected per sheet, the default), one of {', '.join(LAYOUT_PROFILES)} or a JSON profile file.")
+    args = parser.parse_args()
+
+    try:
+        profile = None if args.layout == 'auto' else get_layout_profile(args.layout)
+        index = MemberIndex.load(args.excel_file, rebuild=args.rebuild, profile=profile)
+    except FileNotFoundError:
+        print(f"Error: File '{args.excel_file}' not found.")
+        raise SystemExit(1)
+    except Exception as e:
+        print(f"Error: Could not build the member index of '{args.excel_file}': {e}")
+        raise SystemExit(1)
+
+    if args.member is None and args.ic is None:
+        print(f"Indexed {len(index.members)} members ({len(index.ics)} IC numbers) across {len(index.sheets)} sheets in '{index_path(args.excel_file)}'.")
+        for key, first_sheet, other_sheet in index.duplicates:
+            print(f"  Warning: '{key}' appears in both sheet '{first_sheet}' and sheet '{other_sheet}'; lookups return '{first_sheet}'.")
+        return
+
+    sheet_name = index.find_sheet(args.member) if args.member is not None else index.find_by_ic(args.ic)
+    if sheet_name is None:
+        print(f"Error: No sheet found for {'member' if args.member is not None else 'IC number'} '{args.member or args.ic}'.")
+        raise SystemExit(1)
+    print(json.dumps({"sheet": sheet_name, **index.record(sheet_name)}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import collections
+import functools
+import logging
+import os
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from aexcel import READER_ENGINES
+from dwrite import ENCODERS, get_encoder
+from instrument import STATS, configure_logging
+from cformat import LAYOUT_PROFILES, get_layout_profile
+from main import convert_in_worker, detect_file_profile, init_worker
+from memberindex import MemberIndex
+from sheetcache import DEFAULT_CACHE_SIZE_MB, SheetCache
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable"}
+# Latency percentiles are taken over the most recent requests only
+LATENCY_WINDOW = 1000
+# Times a conversion is retried on a new pool after a reload or a crashed worker took down the old one
+CONVERSION_RETRIES = 1
+
+
+class WarmWorkbook:
+    """
+    The workbook a server answers from: its member index, a pool of worker processes that each
+    keep the workbook open, and the encoded statements converted so far (an LRU of cache_size
+    sheets). All of it is rebuilt when the file's size or modification time changes.
+    layout is the statements' cformat.LayoutProfile; when None it is detected from the first
+    statement sheet on every (re)load, as main.py does for a batch.
+    """
+
+    def __init__(self, excel_file, engine='pandas', workers=1, sheet_cache=None, cache_size=256, encode=None, layout=None):
+        self.excel_file = excel_file
+        self.engine = engine
+        self.layout = layout
+        self.profile = layout
+        self.workers = workers
+        self.sheet_cache = sheet_cache
+        self.cache_size = cache_size
+        self.encode = encode or get_encoder('json', None)
+        self.index = None
+        self.generation = 0
+        self.reloads = 0
+        self.hits = 0
+        self.misses = 0
+        self.executor = None
+        self._signature = None
+        # sheet name -> (HTTP status, encoded body); errors are kept too, they repeat until the file changes
+        self._statements = collections.OrderedDict()
+        self._in_flight = {}
+        self._reload_task = None
+
+    def _file_signature(self):
+        stat = os.stat(self.excel_file)
+        return stat.st_size, stat.st_mtime_ns
+
+    async def ensure_current(self):
+        # Start a reload if the file changed since it was loaded. The new index and pool are built in
+        # the background while requests go on being answered from the current version; only the first
+        # load is waited for. While a replaced file is missing or half-written the previous version
+        # keeps being served and the reload is retried on a later request.
+        try:
+            changed = self._file_signature() != self._signature
+        except OSError:
+            if self._signature is None:
+                raise
+            changed = True
+        if changed and self._reload_task is None:
+            self._reload_task = asyncio.ensure_future(self._reload())
+        if self._signature is None and self._reload_task is not None:
+            await self._reload_task
+
+    async def _reload(self):
+        loop = asyncio.get_running_loop()
+        try:
+            signature = self._file_signature()
+            profile = self.layout or await loop.run_in_executor(None, detect_file_profile, self.excel_file, self.engine)
+            # Start every worker (each opens the workbook) while the member index is loaded, before
+            # the new version is served, so the first requests after a load don't pay for it
+            executor = self._new_executor(profile)
+            try:
+                load_index = functools.partial(MemberIndex.load, self.excel_file, profile=profile, engine=self.engine)
+                index, *_ = await asyncio.gather(loop.run_in_executor(None, load_index),
+                                                 *(loop.run_in_executor(executor, os.getpid) for _ in range(self.workers)))
+            except Exception:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        except Exception as e:
+            if self._signature is None:
+                raise
+            print(f"Error: Could not reload '{self.excel_file}', still serving the previous version: {e}")
+            return
+        finally:
+            self._reload_task = None
+
+        # Nothing is awaited from here on, so every request sees either the old or the new version
+        old_executor = self.executor
+        self.executor = executor
+        if old_executor is not None:
+            old_executor.shutdown(wait=False, cancel_futures=True)
+            self.reloads += 1
+            print(f"Reloaded '{self.excel_file}' ({len(index.sheets)} sheets).")
+        self.profile = profile
+        self.index = index
+        self.generation += 1
+        self._signature = signature
+        self._statements.clear()
+
+    def _new_executor(self, profile=None):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                   initargs=(self.excel_file, self.engine, self.sheet_cache, None, None, profile or self.profile))
+
+    def _replace_broken_executor(self, executor):
+        # A worker died (e.g. killed for memory) and took the pool down with it; every later
+        # submission would fail, so start a new pool unless another request already did
+        if executor is self.executor:
+            self.executor = self._new_executor()
+            executor.shutdown(wait=False, cancel_futures=True)
+            print(f"Error: A worker process of '{self.excel_file}' died; restarted the worker pool.")
+
+    @property
+    def cached_statements(self):
+        return len(self._statements)
+
+    @property
+    def sheet_names(self):
+        return list(self.index.sheets) if self.index is not None else []
+
+    def resolve(self, member=None, ic=None):
+        # Exact member index lookup: member number, sheet number or sheet name, or an IC number
+        return self.index.find_by_ic(ic) if ic is not None else self.index.find_sheet(member)
+
+    async def statement(self, sheet_name):
+        # (HTTP status, encoded body) for one sheet, converting it on the pool if it is not cached yet.
+        # Concurrent requests for the same sheet share one conversion.
+        cached = self._statements.get(sheet_name)
+        if cached is not None:
+            self._statements.move_to_end(sheet_name)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        key = (self.generation, sheet_name)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._convert(sheet_name, self.generation))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await task
+
+    async def _convert(self, sheet_name, generation):
+        loop = asyncio.get_running_loop()
+        for _ in range(CONVERSION_RETRIES + 1):
+            executor = self.executor
+            try:
+                _, formatted_data, error, _, stats = await loop.run_in_executor(executor, convert_in_worker, sheet_name)
+                break
+            except (asyncio.CancelledError, CancelledError):
+                # Cancelled by a reload shutting the old pool down: convert on the new one instead
+                if executor is self.executor:
+                    raise
+            except BrokenProcessPool:
+                self._replace_broken_executor(executor)
+        else:
+            return 503, self.encode({"sheet": sheet_name, "error": "The worker pool was restarted while converting; try again."}).encode('utf-8')
+        STATS.merge(stats)
+        if error is not None:
+            result = 422, self.encode({"sheet": sheet_name, "error": error})
+        else:
+            result = 200, self.encode(formatted_data)
+        result = result[0], result[1].encode('utf-8')
+        # A reload while this was running makes the result stale; answer with it but don't keep it
+        if generation == self.generation:
+            self._statements[sheet_name] = result
+            if len(self._statements) > self.cache_size:
+                self._statements.popitem(last=False)
+        return result
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ServerMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds, status):
+        self.requests += 1
+        if status >= 400:
+            self.errors += 1
+        self.latencies.append(seconds * 1000)
+
+    def snapshot(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3) if ordered else None
+
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": {
+                "avg": round(sum(ordered) / len(ordered), 3) if ordered else None,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(ordered[-1], 3) if ordered else None,
+            },
+        }
+
+
+class ConversionServer:
+    """
+    Minimal HTTP/1.1 front end for a WarmWorkbook:
+      GET /statement/<member number>           the statement JSON (a sheet number or name works too)
+      GET /statement?ic=<IC number>            the statement JSON of the member with that NO. K/P
+      GET /member/<member number>, /member?ic=<IC number>
+                                               the member's sheet, NO. ANGGOTA, NO. K/P and NAMA from
+                                               the index, without converting anything
+      GET /sheets                              the workbook's sheet names
+      GET /metrics                             request latency, statement cache and reload counters,
+                                               and the conversions' stage timings and counters
+    """
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.metrics = ServerMetrics()
+        self._encode_json = get_encoder('json', None)
+
+    async def dispatch(self, method, target):
+        if method != "GET":
+            return 405, {"error": f"Method {method} not allowed."}
+        url = urlsplit(target)
+        path = unquote(url.path)
+        route, _, member = path.partition("/")[2].partition("/")
+        if route in ("statement", "member"):
+            ic = parse_qs(url.query).get("ic", [None])[0]
+            if not member and ic is None:
+                return 400, {"error": f"Use /{route}/<member number> or /{route}?ic=<IC number>."}
+            await self.workbook.ensure_current()
+            sheet_name = self.workbook.resolve(member or None, ic)
+            if sheet_name is None:
+                return 404, {"error": f"No sheet found for {'IC number' if ic is not None else 'member'} '{ic if ic is not None else member}'."}
+            if route == "member":
+                return 200, {"sheet": sheet_name, **self.workbook.index.record(sheet_name)}
+            return await self.workbook.statement(sheet_name)
+        if path == "/sheets":
+            await self.workbook.ensure_current()
+            return 200, self.workbook.sheet_names
+        if path == "/metrics":
+            metrics = self.metrics.snapshot()
+            metrics.update({
+                "workbook": self.workbook.excel_file,
+                "generation": self.workbook.generation,
+                "reloads": self.workbook.reloads,
+                "sheets": len(self.workbook.sheet_names),
+                "statement_cache": {"hits": self.workbook.hits, "misses": self.workbook.misses,
+                                    "entries": self.workbook.cached_statements},
+                "conversions": STATS.summary(),
+            })
+            return 200, metrics
+        return 404, {"error": f"Unknown path '{path}'."}
+
+    async def handle_connection(self, reader, writer):
+        # One connection may carry several requests (HTTP/1.1 keep-alive); request bodies are ignored
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("content-length", "0").isdigit() and int(headers.get("content-length", "0")):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                started = time.perf_counter()
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    status, body = 400, {"error": "Malformed request line."}
+                    version = "HTTP/1.0"
+                else:
+                    method, target, version = parts
+                    try:
+                        status, body = await self.dispatch(method, target)
+                    except Exception as e:
+                        status, body = 500, {"error": str(e)}
+                if not isinstance(body, bytes):
+                    body = self._encode_json(body).encode("utf-8")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                        "Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                writer.write(head.encode("latin-1") + body)
+                await writer.drain()
+                self.metrics.record(time.perf_counter() - started, status)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(excel_file, host="127.0.0.1", port=8080, socket_path=None, engine='pandas', workers=1,
+                sheet_cache=None, cache_size=256, indent=None, encoder='json', layout=None):
+    workbook = WarmWorkbook(excel_file, engine, workers, sheet_cache, cache_size, get_encoder(encoder, indent), layout)
+    try:
+        await workbook.ensure_current()
+    except FileNotFoundError:
+        print(f"Error: File '{excel_file}' not found.")
+        return
+    except Exception as e:
+        print(f"Error: Could not load '{excel_file}': {e}")
+        workbook.close()
+        return
+    server = ConversionServer(workbook)
+    if socket_path:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=socket_path)
+        address = f"unix:{socket_path}"
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+        address = f"http://{host}:{port}"
+    print(f"Serving '{excel_file}' ({len(workbook.sheet_names)} sheets, {workbook.profile.name} layout) on {address}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        workbook.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve statements from a workbook over HTTP, keeping it loaded between requests.")
+    parser.add_argument("excel_file", help="Path to the Excel file. It is reloaded automatically when it changes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument("-p", "--port", type=int, default=8080, help="Port to listen on (default: 8080).")
+    parser.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket at PATH instead of TCP.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Worker processes converting sheets (default: 1).")
+    parser.add_argument("--cache-size", type=int, default=256, help="How many converted statements to keep in memory (default: 256).")
+    parser.add_argument("--sheet-cache", metavar="DIR", help="Also keep parsed sheets on disk in DIR across restarts.")
+    parser.add_argument("--sheet-cache-size", type=int, default=DEFAULT_CACHE_SIZE_MB, metavar="MB", help=f"Size limit of --sheet-cache (default: {DEFAULT_CACHE_SIZE_MB}).")
+    parser.add_argument("-i", "--indent", type=int, help="Indent the statement JSON. Omit for compact output.")
+    parser.add_argument("--encoder", choices=ENCODERS, default="json", help="JSON encoder: json (default), orjson (compact or --indent 2 only), or auto (orjson when installed and it can give the indent).")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="pandas", help="Sheet reader: pd.read_excel (default), streaming read-only openpyxl, or xml (a value-only parser streaming the sheet XML straight out of the .xlsx).")
+    parser.add_argument("--layout", default="auto", metavar="NAME|FILE", help=f"Statement layout profile: auto (detected from the first statement sheet on every load, the default), one of {', '.join(LAYOUT_PROFILES)} or a JSON file of cformat.LayoutProfile settings.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the formatter's debug output for every conversion.")
+    args = parser.parse_args()
+
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING)
+    sheet_cache = SheetCache(args.sheet_cache, args.sheet_cache_size * 1024 * 1024) if args.sheet_cache else None
+    try:
+        layout = None if args.layout == 'auto' else get_layout_profile(args.layout)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    try:
+        asyncio.run(serve(args.excel_file, args.host, args.port, args.socket, args.reader, args.workers,
+                          sheet_cache, args.cache_size, args.indent, args.encoder, layout))
+    except (ImportError, ValueError) as e:
+        print(f"Error: {e}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import pickle
+
+import aexcel
+import cformat
+import sheetgrid
+import xlsxzip
+
+DEFAULT_CACHE_SIZE_MB = 512
+CACHE_FILE_SUFFIX = ".sheet.pickle"
+
+
+def reader_version():
+    # Parsed sheets depend on the reader code (and planned reads on cformat's read plan); a changed
+    # reader must not reuse old entries
+    digest = hashlib.sha256()
+    for module in (aexcel, cformat, sheetgrid, xlsxzip):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class SheetCache:
+    """
+    On-disk cache of parsed sheets (the SheetGrid cformat consumes), one pickle file per
+    (workbook path, size, mtime, sheet name, reader). Editing or replacing the workbook changes
+    its size/mtime and so bypasses the old entries. When the files exceed max_bytes, the least
+    recently used ones are deleted; a cache hit counts as a use.
+    Several processes may share one directory. A copy of the cache in another process (a --workers
+    pool worker) rescans the directory before every eviction decision, so the workers keep the
+    limit between them rather than each against its own stale view.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._version = reader_version()
+        os.makedirs(cache_dir, exist_ok=True)
+        # path -> (last use, size); scanned once, then kept up to date by get/put in this process
+        self._owner_pid = os.getpid()
+        self._scan()
+
+    def _scan(self):
+        self._entries = {}
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_FILE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError: # evicted by another process meanwhile
+                    continue
+                self._entries[entry.path] = (stat.st_mtime, stat.st_size)
+        self._total_bytes = sum(size for _, size in self._entries.values())
+
+    def _path(self, excel_file, sheet_name, engine):
+        stat = os.stat(excel_file)
+        key = "\0".join([os.path.abspath(excel_file), str(stat.st_size), str(stat.st_mtime_ns),
+                         str(sheet_name), engine, self._version])
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + CACHE_FILE_SUFFIX)
+
+    def get(self, excel_file, sheet_name, engine="pandas"):
+        # The cached SheetGrid, or None
+        path = self._path(excel_file, sheet_name, engine)
+        try:
+            with open(path, "rb") as f:
+                grid = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path) # mark as recently used
+            self._entries[path] = (os.stat(path).st_mtime, self._entries.get(path, (0, os.path.getsize(path)))[1])
+        except FileNotFoundError: # evicted by another process in the meantime
+            pass
+        return grid
+
+    def put(self, excel_file, sheet_name, grid, engine="pandas"):
+        path = self._path(excel_file, sheet_name, engine)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(grid, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        if os.getpid() != self._owner_pid:
+            # Other workers write to the directory too
+            self._scan()
+        else:
+            stat = os.stat(path)
+            self._total_bytes += stat.st_size - self._entries.get(path, (0, 0))[1]
+            self._entries[path] = (stat.st_mtime, stat.st_size)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # Delete least recently used entries until the cache fits in max_bytes
+        for path, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            del self._entries[path]
+            self._total_bytes -= size
+
+    def clear(self):
+        for path in list(self._entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._entries.clear()
+        self._total_bytes = 0
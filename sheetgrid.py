@@ -0,0 +1,107 @@
+import re
+from collections import namedtuple
+
+# Column labels pandas invents for header cells that are empty
+UNNAMED_LABEL_RE = re.compile(r"^Unnamed: \d+$")
+
+# A two-phase sheet read: every column of the first probe_rows grid rows, then below them only the
+# columns plan_columns(probe grid) returns (None reads the rest of the sheet in full). name keeps the
+# grids of different plans apart in the sheet cache.
+ReadPlan = namedtuple("ReadPlan", ["probe_rows", "plan_columns", "name"], defaults=("planned",))
+
+
+class SheetGrid:
+    """
+    One worksheet as a dense grid of cell values addressed by (row, col) integers.
+
+    Cells live in a single flat list, column after column, so a column is one contiguous
+    slice. Rows are numbered like the pandas row index (0 is the first row under the
+    header row) and columns by position. `columns` holds each column's header text, or
+    None for a column without one (what pandas would label "Unnamed: <col>").
+    """
+    __slots__ = ("columns", "n_rows", "cells", "_column_positions")
+
+    def __init__(self, columns, n_rows, cells=None):
+        self.columns = list(columns)
+        self.n_rows = n_rows
+        self.cells = cells if cells is not None else [None] * (n_rows * len(self.columns))
+        self._column_positions = None
+
+    @property
+    def n_cols(self):
+        return len(self.columns)
+
+    @classmethod
+    def from_columns(cls, columns, column_values):
+        # column_values: one list of cell values per column, all of the same length
+        n_rows = len(column_values[0]) if column_values else 0
+        cells = []
+        for values in column_values:
+            cells.extend(values)
+        return cls(columns, n_rows, cells)
+
+    def get(self, row, col):
+        if 0 <= row < self.n_rows and 0 <= col < len(self.columns):
+            return self.cells[col * self.n_rows + row]
+        return None
+
+    def set(self, row, col, value):
+        self.cells[col * self.n_rows + row] = value
+
+    def column(self, col, start=0, stop=None):
+        # Values of one column from row start up to (not including) row stop
+        if not 0 <= col < len(self.columns):
+            return []
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        base = col * self.n_rows
+        return self.cells[base + max(start, 0):base + stop]
+
+    def column_index(self, label):
+        # Position of the column with this header text, or None
+        if self._column_positions is None:
+            self._column_positions = {}
+            for col, header in enumerate(self.columns):
+                if header is not None:
+                    self._column_positions.setdefault(header, col)
+        return self._column_positions.get(label)
+
+    def is_unnamed(self, col):
+        return 0 <= col < len(self.columns) and self.columns[col] is None
+
+    # --- Adapter for the pandas-style {"Unnamed: N": {"row": value}} dicts ---
+
+    def column_label(self, col):
+        header = self.columns[col]
+        return f"Unnamed: {col}" if header is None else str(header)
+
+    @classmethod
+    def from_raw_data(cls, raw_data):
+        columns = []
+        column_dicts = []
+        n_rows = 0
+        for label, col_data in raw_data.items():
+            columns.append(None if UNNAMED_LABEL_RE.match(label) else label)
+            rows = {int(k): v for k, v in col_data.items() if k.isdigit()} if isinstance(col_data, dict) else {}
+            column_dicts.append(rows)
+            if rows:
+                n_rows = max(n_rows, max(rows) + 1)
+        grid = cls(columns, n_rows)
+        for col, rows in enumerate(column_dicts):
+            base = col * n_rows
+            for row, value in rows.items():
+                grid.cells[base + row] = value
+        return grid
+
+    def to_raw_data(self):
+        row_keys = [str(row) for row in range(self.n_rows)]
+        return {
+            self.column_label(col): dict(zip(row_keys, self.column(col)))
+            for col in range(len(self.columns))
+        }
+
+    def __getstate__(self):
+        return (self.columns, self.n_rows, self.cells)
+
+    def __setstate__(self, state):
+        self.columns, self.n_rows, self.cells = state
+        self._column_positions = None
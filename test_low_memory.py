@@ -0,0 +1,29 @@
+import json
+import os
+
+import pytest
+
+from bench import MEMORY_CHECK_SHEETS, generate_workbook, run_memory_check
+
+# The full-size workbook bench.py --memory-check converts; XLSX2JSON_TEST_SHEETS=200 for a quick run
+SHEETS = int(os.environ.get("XLSX2JSON_TEST_SHEETS", str(MEMORY_CHECK_SHEETS)))
+MEMORY_BUDGET_MB = int(os.environ.get("XLSX2JSON_TEST_MEMORY_MB", "256"))
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    return generate_workbook(str(tmp_path_factory.mktemp("workbook") / f"bench-{SHEETS}.xlsx"), SHEETS)
+
+
+def test_low_memory_batch_stays_under_budget(workbook, tmp_path):
+    output_file = str(tmp_path / "statements.json")
+    returncode, peak, _ = run_memory_check(workbook, output_file, MEMORY_BUDGET_MB)
+
+    assert returncode == 0
+    if peak is None:
+        pytest.skip("The peak RSS can't be measured on this platform.")
+    assert peak <= MEMORY_BUDGET_MB
+    with open(output_file, "r", encoding="utf-8") as f:
+        statements = json.load(f)
+    assert len(statements) == SHEETS
+    assert all(statement["TRANSACTIONS"] for statement in statements.values())
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from bench import generate_workbook
+from main import run_batch
+from sheetcache import CACHE_FILE_SUFFIX, SheetCache
+
+SHEETS = 60
+MAX_BYTES = 64 * 1024
+
+
+def cache_bytes(cache_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(CACHE_FILE_SUFFIX))
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    return generate_workbook(str(tmp_path_factory.mktemp("workbook") / f"bench-{SHEETS}.xlsx"), SHEETS)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sheet_cache_stays_under_its_size_limit(workbook, tmp_path, workers):
+    cache_dir = str(tmp_path / "cache")
+    failures = run_batch(workbook, str(tmp_path / "statements"), workers=workers, engine='xml',
+                         sheet_cache=SheetCache(cache_dir, MAX_BYTES))
+
+    assert failures == []
+    assert len(os.listdir(tmp_path / "statements")) == SHEETS
+    assert 0 < cache_bytes(cache_dir) <= MAX_BYTES
@@ -0,0 +1,263 @@
+import hashlib
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+# Reading the .xlsx package (a zip of XML parts) directly, without openpyxl's workbook and cell
+# objects or pandas (only openpyxl's number format and date helpers, so values come out the same)
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# <c ... t="s"><v>12</v></c>: a cell holding shared string 12
+SHARED_STRING_CELL_RE = re.compile(rb'<(?:\w+:)?c\b[^>]*?\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)</(?:\w+:)?v>')
+
+
+def _find_part(names, candidates):
+    # Parts are case-sensitive in the zip but not always written with the expected case
+    lowered = {name.lower(): name for name in names}
+    for candidate in candidates:
+        if candidate.lower() in lowered:
+            return lowered[candidate.lower()]
+    return None
+
+
+def workbook_part(zf):
+    return _find_part(zf.namelist(), ["xl/workbook.xml"]) or "xl/workbook.xml"
+
+
+def sheet_parts(zf):
+    # {sheet name: worksheet part path inside the zip}, in workbook order
+    wb_part = workbook_part(zf)
+    rels_part = posixpath.join(posixpath.dirname(wb_part), "_rels", posixpath.basename(wb_part) + ".rels")
+    targets = {}
+    for rel in ET.fromstring(zf.read(rels_part)).iter(f"{{{PKG_REL_NS}}}Relationship"):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            target = target.lstrip("/")
+        else:
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(wb_part), target))
+        targets[rel.get("Id")] = target
+
+    parts = {}
+    sheets = ET.fromstring(zf.read(wb_part)).find(f"{{{MAIN_NS}}}sheets")
+    for sheet in sheets if sheets is not None else ():
+        target = targets.get(sheet.get(f"{{{REL_NS}}}id"))
+        if target is not None:
+            parts[sheet.get("name")] = _find_part(zf.namelist(), [target]) or target
+    return parts
+
+
+def load_shared_strings(zf):
+    # The workbook's shared string table as a list indexed like the sheets' t="s" cells
+    part = _find_part(zf.namelist(), ["xl/sharedStrings.xml"])
+    if part is None:
+        return []
+    strings = []
+    si_tag = f"{{{MAIN_NS}}}si"
+    with zf.open(part) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != si_tag:
+                continue
+            # openpyxl drops the x005F_ escape prefix from shared strings
+            strings.append(_string_item_text(elem).replace("x005F_", ""))
+            elem.clear()
+    return strings
+
+
+def _string_item_text(elem):
+    # Text of a shared string <si> or inline string <is>: plain <t>, or rich-text runs <r><t>..</t></r>;
+    # phonetic guides (<rPh>) are not cell text
+    t_tag, rph_tag = f"{{{MAIN_NS}}}t", f"{{{MAIN_NS}}}rPh"
+    text_parts = []
+    for child in elem:
+        if child.tag == t_tag:
+            text_parts.append(child.text or "")
+        elif child.tag != rph_tag:
+            text_parts.extend(t.text or "" for t in child.iter(t_tag))
+    return "".join(text_parts)
+
+
+def load_date_styles(zf):
+    # (cell style ids whose number format shows a date or time, style ids shown as a duration),
+    # decided the way openpyxl does
+    part = _find_part(zf.namelist(), ["xl/styles.xml"])
+    if part is None:
+        return frozenset(), frozenset()
+    root = ET.fromstring(zf.read(part))
+    custom_formats = {}
+    num_fmts = root.find(f"{{{MAIN_NS}}}numFmts")
+    for num_fmt in num_fmts if num_fmts is not None else ():
+        custom_formats[int(num_fmt.get("numFmtId"))] = num_fmt.get("formatCode")
+    date_styles = set()
+    timedelta_styles = set()
+    cell_xfs = root.find(f"{{{MAIN_NS}}}cellXfs")
+    for style_id, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+        num_fmt_id = int(xf.get("numFmtId", 0))
+        fmt = custom_formats[num_fmt_id] if num_fmt_id in custom_formats else builtin_format_code(num_fmt_id)
+        if is_date_format(fmt):
+            date_styles.add(style_id)
+        if is_timedelta_format(fmt):
+            timedelta_styles.add(style_id)
+    return frozenset(date_styles), frozenset(timedelta_styles)
+
+
+def workbook_epoch(zf):
+    # Day 0 of the workbook's serial dates: 1899-12-30, or 1904-01-01 for the Mac date system
+    workbook_pr = ET.fromstring(zf.read(workbook_part(zf))).find(f"{{{MAIN_NS}}}workbookPr")
+    date1904 = workbook_pr.get("date1904", "") if workbook_pr is not None else ""
+    return CALENDAR_MAC_1904 if date1904.lower() in ("1", "true") else CALENDAR_WINDOWS_1900
+
+
+def workbook_context_digest(zf):
+    # Workbook-wide parts that change what a sheet's cells mean: number formats (dates vs numbers)
+    # and the 1900/1904 date system
+    digest = hashlib.sha256()
+    styles_part = _find_part(zf.namelist(), ["xl/styles.xml"])
+    if styles_part is not None:
+        digest.update(zf.read(styles_part))
+    workbook_pr = re.search(rb"<(?:\w+:)?workbookPr\b[^>]*>", zf.read(workbook_part(zf)))
+    digest.update(workbook_pr.group(0) if workbook_pr else b"")
+    return digest.hexdigest()
+
+
+def sheet_fingerprints(excel_file, sheet_names=None):
+    """
+    {sheet name: content hash} for the workbook's sheets (or just sheet_names).
+    The hash covers the sheet's XML, the text of every shared string it references and the
+    workbook-wide styles, so it only changes when something that can affect the sheet's values
+    changes, and not because another sheet added strings to sharedStrings.xml.
+    """
+    with zipfile.ZipFile(excel_file) as zf:
+        parts = sheet_parts(zf)
+        shared_strings = load_shared_strings(zf)
+        context = workbook_context_digest(zf).encode("ascii")
+        fingerprints = {}
+        for sheet_name in (parts if sheet_names is None else sheet_names):
+            part = parts.get(sheet_name)
+            if part is None:
+                continue
+            sheet_xml = zf.read(part)
+            digest = hashlib.sha256(context)
+            digest.update(sheet_xml)
+            for match in SHARED_STRING_CELL_RE.finditer(sheet_xml):
+                index = int(match.group(1))
+                text = shared_strings[index] if index < len(shared_strings) else ""
+                digest.update(b"\0" + text.encode("utf-8"))
+            fingerprints[sheet_name] = digest.hexdigest()
+    return fingerprints
+
+
+_COLUMN_NUMBERS = {}
+
+
+def _column_number(ref):
+    # "AB12" -> 28
+    letters = ref.rstrip("0123456789")
+    number = _COLUMN_NUMBERS.get(letters)
+    if number is None:
+        number = 0
+        for letter in letters.upper():
+            number = number * 26 + ord(letter) - 64
+        _COLUMN_NUMBERS[letters] = number
+    return number
+
+
+class XlsxReader:
+    """
+    Value-only .xlsx reader streaming each worksheet's XML straight out of the zip.
+    The shared string table, the date styles and the date system are loaded once when the
+    workbook is opened and shared by every sheet read from it. Values are what openpyxl's
+    read-only, data_only mode gives: strings, ints/floats, bools, datetimes for date-formatted
+    numbers and the cached result of formulas; error cells read as None.
+    """
+
+    def __init__(self, excel_file):
+        self.excel_file = excel_file
+        self.zf = zipfile.ZipFile(excel_file)
+        try:
+            self._parts = sheet_parts(self.zf)
+            self.shared_strings = load_shared_strings(self.zf)
+            self.date_styles, self.timedelta_styles = load_date_styles(self.zf)
+            self.epoch = workbook_epoch(self.zf)
+        except Exception:
+            self.zf.close()
+            raise
+
+    @property
+    def sheetnames(self):
+        return list(self._parts)
+
+    def iter_cells(self, sheet_name, max_row=None):
+        # (row, column, value) for every cell holding a value, 1-based and in sheet order
+        row_tag, c_tag, v_tag, is_tag = (f"{{{MAIN_NS}}}{tag}" for tag in ("row", "c", "v", "is"))
+        shared_strings = self.shared_strings
+        date_styles = self.date_styles
+        with self.zf.open(self._parts[sheet_name]) as f:
+            row_number = 0
+            for _, elem in ET.iterparse(f):
+                if elem.tag != row_tag:
+                    continue
+                ref = elem.get("r")
+                row_number = int(ref) if ref else row_number + 1
+                if max_row is not None and row_number > max_row:
+                    break
+                col = 0
+                for cell in elem:
+                    if cell.tag != c_tag:
+                        continue
+                    ref = cell.get("r")
+                    col = _column_number(ref) if ref else col + 1
+                    data_type = cell.get("t", "n")
+                    if data_type == "inlineStr":
+                        text = cell.find(is_tag)
+                        if text is not None:
+                            yield row_number, col, _string_item_text(text)
+                        continue
+                    value = cell.findtext(v_tag)
+                    if not value or data_type == "e":
+                        continue
+                    if data_type == "n":
+                        value = float(value) if "." in value or "E" in value or "e" in value else int(value)
+                        style_id = int(cell.get("s", 0))
+                        if style_id in date_styles:
+                            value = self._date_value(value, style_id)
+                    elif data_type == "s":
+                        value = shared_strings[int(value)]
+                    elif data_type == "b":
+                        value = bool(int(value))
+                    elif data_type == "d":
+                        value = from_ISO8601(value)
+                    yield row_number, col, value
+                elem.clear()
+
+    def _date_value(self, serial, style_id):
+        try:
+            return from_excel(serial, self.epoch, timedelta=style_id in self.timedelta_styles)
+        except (OverflowError, ValueError):
+            return None # outside the limits of dates; openpyxl reads these as an error cell
+
+    def iter_rows(self, sheet_name, max_row=None):
+        # Rows of values like openpyxl's iter_rows(values_only=True): missing rows come out empty and
+        # each row is as long as its last cell with a value
+        next_row = 1
+        row = []
+        for row_number, col, value in self.iter_cells(sheet_name, max_row):
+            if row_number != next_row:
+                yield tuple(row)
+                next_row += 1
+                row = []
+                while next_row < row_number:
+                    yield ()
+                    next_row += 1
+            if col > len(row):
+                row.extend([None] * (col - len(row)))
+            row[col - 1] = value
+        if row:
+            yield tuple(row)
+
+    def close(self):
+        self.zf.close()